@@ -5,75 +5,269 @@ Minimal Read-Only API (FastAPI)
 - Serves expanded nodes (data/codex_nodes_full.json)
 - Simple filters: by id, element, planet, zodiac, safety, tags, culture.
 - CORS open by default for local prototypes.
+- Codex is loaded once at startup and served from in-memory indexes (api/codex_store.py).
+- New builds are picked up without a restart (poll interval: CODEX_RELOAD_INTERVAL seconds, 0 disables).
+- Strong ETags (node lock_hash / dataset version + query) with If-None-Match -> 304,
+  plus Cache-Control (CODEX_CACHE_CONTROL).
+- Bodies come from bytes serialized once per dataset version; popular list
+  queries are kept in an LRU (CODEX_RESPONSE_CACHE entries).
+- /nodes supports fields= projection, opaque cursor pagination (next_cursor)
+  and count=false to skip the total.
+- /nodes:batch returns many nodes in one round trip (GET ?ids=1,5,77 or POST {"ids": [...]})
+  and lists unknown ids under "missing".
+- /nodes.ndjson streams every matching node, one JSON object per line.
+- /search?q= ranks nodes by BM25 over names, keywords, deities, angels and demons.
 
 Run:
   uvicorn api.codex_api:app --reload --port 8777
 """
 
-import os, json
-from typing import Optional
-from fastapi import FastAPI, HTTPException, Query
+import os, json, base64, binascii, hashlib
+from bisect import bisect_right
+from itertools import islice
+from datetime import datetime, timezone
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from pydantic import BaseModel
+
+from api.codex_store import CodexStore, dumps
 
 DATA_PATH = os.path.join("data","codex_nodes_full.json")
+RELOAD_INTERVAL = float(os.environ.get("CODEX_RELOAD_INTERVAL", "2"))
+CACHE_CONTROL = os.environ.get("CODEX_CACHE_CONTROL", "public, max-age=60")
+RESPONSE_CACHE = int(os.environ.get("CODEX_RESPONSE_CACHE", "256"))
+BATCH_LIMIT = 256
+STREAM_CHUNK = 64 * 1024
+
+store = CodexStore(DATA_PATH, cache_size=RESPONSE_CACHE)
 
-app = FastAPI(title="Codex 144:99 – Read-Only API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm the indexes once; a missing build is reported per request instead.
+    try:
+        store.load()
+    except FileNotFoundError:
+        pass
+    store.watch(RELOAD_INTERVAL)
+    yield
+    store.stop()
+
+app = FastAPI(title="Codex 144:99 – Read-Only API", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], allow_credentials=False,
-    allow_methods=["GET"], allow_headers=["*"]
+    allow_methods=["GET", "POST"], allow_headers=["*"]
 )
 
-def _load():
-    if not os.path.exists(DATA_PATH):
-        raise FileNotFoundError(f"Missing {DATA_PATH}. Build the codex first.")
-    with open(DATA_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
+def _query_key(**params) -> str:
+    """Canonical form of a query: unset params dropped, keys sorted."""
+    return json.dumps({k: v for k, v in params.items() if v is not None}, sort_keys=True)
+
+def _list_etag(version: str, key: str) -> str:
+    return '"' + hashlib.sha256(f"{version}|{key}".encode("utf-8")).hexdigest()[:32] + '"'
+
+def _node_etag(version: str, node: dict) -> str:
+    lock_hash = node.get("lock_hash")
+    if lock_hash:
+        return f'"{lock_hash}"'
+    return _list_etag(version, f"node:{node.get('node_id')}")
+
+def _not_modified(request: Request, etag: str) -> bool:
+    """If-None-Match uses weak comparison, so W/ prefixes are ignored."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(t.strip().removeprefix("W/") == etag for t in header.split(","))
+
+def _encode_cursor(node_id: int) -> str:
+    raw = json.dumps({"after": node_id}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+def _decode_cursor(token: str) -> int:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        after = json.loads(raw)["after"]
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(after, int) or isinstance(after, bool):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return after
+
+def _parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    if not fields:
+        return None
+    keys = [f.strip() for f in fields.split(",") if f.strip()]
+    return list(dict.fromkeys(keys)) or None
+
+def _parse_ids(ids: str) -> List[int]:
+    try:
+        return [int(i) for i in ids.split(",") if i.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+
+def _batch_body(snap, ids: List[int], fields: Optional[str]) -> bytes:
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > BATCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_LIMIT} ids per batch")
+    found = [snap.position[i] for i in ids if i in snap.position]
+    missing = [i for i in ids if i not in snap.position]
+    return (b'{"items":' + snap.encode_items(found, _parse_fields(fields))
+            + b',"missing":' + dumps(missing) + b"}")
+
+def _cache_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
 
 @app.get("/health")
 def health():
-    return {"ok": True}
+    try:
+        snap = store.current()
+    except FileNotFoundError:
+        return {"ok": True, "dataset": None}
+    return {"ok": True, "dataset": {
+        "version": snap.version,
+        "loaded_at": datetime.fromtimestamp(snap.loaded_at, timezone.utc).isoformat(),
+        "nodes": len(snap),
+    }}
 
-@app.get("/nodes")
-def list_nodes(
+def node_filters(
     element: Optional[str] = None,
     planet: Optional[str] = None,
     zodiac: Optional[str] = None,
     safety: Optional[str] = Query(None, description='ptsd_true | with_care'),
     tag: Optional[str] = Query(None, description='match a fusion tag'),
     culture: Optional[str] = Query(None, description='match in gods/goddesses culture'),
-    limit: int = 144,
-    offset: int = 0,
+) -> dict:
+    return dict(element=element, planet=planet, zodiac=zodiac,
+                safety=safety, tag=tag, culture=culture)
+
+@app.get("/nodes")
+def list_nodes(
+    request: Request,
+    filters: dict = Depends(node_filters),
+    limit: int = Query(144, ge=0),
+    offset: int = Query(0, ge=0),
+    fields: Optional[str] = Query(None, description='comma-separated keys to return, e.g. node_id,name,element'),
+    cursor: Optional[str] = Query(None, description='next_cursor from a previous page (overrides offset)'),
+    count: bool = Query(True, description='false skips computing the total'),
 ):
-    nodes = _load()
-
-    def match(n):
-        if element and element not in (n.get("element") if isinstance(n.get("element"), str) else " / ".join(n.get("element", []))):
-            return False
-        if planet and planet not in (n.get("planet") if isinstance(n.get("planet"), str) else " / ".join(n.get("planet", []))):
-            return False
-        if zodiac and zodiac not in n.get("zodiac", ""):
-            return False
-        if tag and tag not in n.get("fusion_tags", []):
-            return False
-        if safety:
-            s = n.get("healing_profile", {}).get("ptsd_safe")
-            if safety == "ptsd_true" and s is not True: return False
-            if safety == "with_care" and s != "with care": return False
-        if culture:
-            gg = (n.get("gods", []) or []) + (n.get("goddesses", []) or [])
-            if not any(culture == g.get("culture") for g in gg):
-                return False
-        return True
+    snap = store.current()
+    key = _query_key(**filters, limit=limit, offset=offset, fields=fields, cursor=cursor, count=count)
+    headers = _cache_headers(_list_etag(snap.version, key))
+    if _not_modified(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    body = store.responses.get((snap.version, key))
+    if body is None:
+        start, after = offset, None
+        if cursor is not None:
+            after = snap.position.get(_decode_cursor(cursor))
+            if after is None:
+                raise HTTPException(status_code=400, detail="Stale cursor: node no longer in dataset")
+            start = after + 1
+        if count:
+            out = snap.select(**filters)
+            if after is not None:
+                start = bisect_right(out, after)
+            page = out[start:start+limit]
+            more = start + limit < len(out)
+            total = len(out)
+        else:
+            # Walk forward from the resume point and stop one past the page.
+            it = snap.scan(start, **filters) if after is not None else islice(snap.scan(0, **filters), start, None)
+            page = list(islice(it, limit + 1))
+            more = len(page) > limit
+            page = page[:limit]
+            total = None
+        next_cursor = _encode_cursor(snap.nodes[page[-1]].get("node_id")) if more and page else None
+        body = snap.encode_list(total, page, _parse_fields(fields), next_cursor)
+        store.responses.put((snap.version, key), body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/nodes.ndjson")
+def stream_nodes(
+    request: Request,
+    filters: dict = Depends(node_filters),
+    fields: Optional[str] = Query(None, description='comma-separated keys to return'),
+):
+    snap = store.current()
+    headers = _cache_headers(_list_etag(snap.version, _query_key(**filters, fields=fields, ndjson=True)))
+    if _not_modified(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    keys = _parse_fields(fields)
+
+    def lines():
+        # Bound to one snapshot: a reload mid-stream never mixes versions.
+        buf = bytearray()
+        for pos in snap.scan(0, **filters):
+            buf += snap.encode_at(pos, keys)
+            buf += b"\n"
+            if len(buf) >= STREAM_CHUNK:
+                yield bytes(buf)
+                buf.clear()
+        if buf:
+            yield bytes(buf)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers=headers)
+
+@app.get("/search")
+def search_nodes(
+    request: Request,
+    q: str = Query(..., min_length=1, description='words to find, e.g. serpent hecate'),
+    prefix: bool = Query(True, description='also match words starting with each query word'),
+    limit: int = Query(20, ge=0),
+    fields: Optional[str] = Query(None, description='comma-separated keys to return'),
+):
+    snap = store.current()
+    key = _query_key(search=q, prefix=prefix, limit=limit, fields=fields)
+    headers = _cache_headers(_list_etag(snap.version, key))
+    if _not_modified(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    body = store.responses.get((snap.version, key))
+    if body is None:
+        hits = snap.search.search(q, prefix=prefix)
+        keys = _parse_fields(fields)
+        items = b",".join(
+            b'{"score":%s,"node":%s}' % (dumps(round(score, 4)), snap.encode_at(pos, keys))
+            for pos, score in hits[:limit]
+        )
+        body = b'{"query":%s,"count":%d,"items":[%s]}' % (dumps(q), len(hits), items)
+        store.responses.put((snap.version, key), body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+class BatchRequest(BaseModel):
+    ids: List[int]
+    fields: Optional[str] = None
+
+@app.get("/nodes:batch")
+def get_nodes_batch(
+    request: Request,
+    ids: str = Query(..., description='comma-separated node ids, e.g. 1,5,77'),
+    fields: Optional[str] = Query(None, description='comma-separated keys to return'),
+):
+    snap = store.current()
+    wanted = _parse_ids(ids)
+    headers = _cache_headers(_list_etag(snap.version, _query_key(batch=wanted, fields=fields)))
+    if _not_modified(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=_batch_body(snap, wanted, fields), media_type="application/json", headers=headers)
 
-    out = [n for n in nodes if match(n)]
-    return {"count": len(out), "items": out[offset:offset+limit]}
+@app.post("/nodes:batch")
+def post_nodes_batch(req: BatchRequest):
+    body = _batch_body(store.current(), req.ids, req.fields)
+    return Response(content=body, media_type="application/json")
 
 @app.get("/nodes/{node_id}")
-def get_node(node_id: int):
-    nodes = _load()
-    for n in nodes:
-        if n.get("node_id") == node_id:
-            return n
+def get_node(node_id: int, request: Request):
+    snap = store.current()
+    n = snap.get(node_id)
+    if n is not None:
+        headers = _cache_headers(_node_etag(snap.version, n))
+        if _not_modified(request, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        return Response(content=snap.encoded_node(node_id), media_type="application/json", headers=headers)
     raise HTTPException(status_code=404, detail="Node not found")
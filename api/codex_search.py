@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Codex Search
+- Inverted token index over name, symbolic_keywords, function, ritual_use,
+  god/goddess names, shem_angel and goetic_demon.
+- BM25 ranking; per (term, node) contributions are precomputed at build time,
+  so a query is a handful of dict lookups and additions.
+- Prefix matching through a sorted vocabulary (bisect), e.g. "serp" -> serpent.
+"""
+
+import math, re
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Tuple
+
+K1 = 1.2
+B = 0.75
+PREFIX_WEIGHT = 0.5  # prefix-only hits rank below exact ones
+
+# field -> weight applied to its term frequencies
+FIELD_WEIGHTS = {
+    "name": 2.0,
+    "symbolic_keywords": 1.5,
+    "gods": 1.5,
+    "goddesses": 1.5,
+    "shem_angel": 1.5,
+    "goetic_demon": 1.5,
+    "function": 1.0,
+    "ritual_use": 1.0,
+}
+
+_TOKEN = re.compile(r"\w+")
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.casefold())
+
+def _texts(value) -> Iterator[str]:
+    """Strings inside a field: plain strings, lists of strings, or {name: ...} entries."""
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        if isinstance(value.get("name"), str):
+            yield value["name"]
+    elif isinstance(value, list):
+        for v in value:
+            yield from _texts(v)
+
+class SearchIndex:
+    """Token -> [(node position, BM25 contribution)] for one snapshot."""
+
+    def __init__(self, nodes: List[dict]):
+        tfs: List[Dict[str, float]] = []
+        lengths: List[float] = []
+        for n in nodes:
+            tf: Dict[str, float] = {}
+            length = 0.0
+            for field, weight in FIELD_WEIGHTS.items():
+                for text in _texts(n.get(field)):
+                    for tok in tokenize(text):
+                        tf[tok] = tf.get(tok, 0.0) + weight
+                        length += weight
+            tfs.append(tf)
+            lengths.append(length)
+
+        total = len(nodes)
+        avgdl = (sum(lengths) / total) if total else 0.0
+        df: Dict[str, int] = {}
+        for tf in tfs:
+            for tok in tf:
+                df[tok] = df.get(tok, 0) + 1
+
+        self.postings: Dict[str, List[Tuple[int, float]]] = {}
+        for pos, tf in enumerate(tfs):
+            norm = K1 * (1 - B + B * lengths[pos] / avgdl) if avgdl else K1
+            for tok, f in tf.items():
+                idf = math.log(1 + (total - df[tok] + 0.5) / (df[tok] + 0.5))
+                self.postings.setdefault(tok, []).append((pos, idf * f * (K1 + 1) / (f + norm)))
+        self.vocab = sorted(self.postings)
+
+    def expand(self, token: str) -> List[str]:
+        """Vocabulary terms starting with token."""
+        out = []
+        i = bisect_left(self.vocab, token)
+        while i < len(self.vocab) and self.vocab[i].startswith(token):
+            out.append(self.vocab[i])
+            i += 1
+        return out
+
+    def search(self, query: str, prefix: bool = True) -> List[Tuple[int, float]]:
+        """(position, score) pairs, best first. Any query token may match."""
+        scores: Dict[int, float] = {}
+        for token in dict.fromkeys(tokenize(query)):
+            terms = self.expand(token) if prefix else [token]
+            for term in terms:
+                weight = 1.0 if term == token else PREFIX_WEIGHT
+                for pos, contrib in self.postings.get(term, ()):
+                    scores[pos] = scores.get(pos, 0.0) + weight * contrib
+        return sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Codex Store
+- Loads data/codex_nodes_full.json once and keeps it in memory.
+- Builds lookup indexes: node_id -> node, plus inverted indexes
+  (value -> posting set of node positions) for the /nodes filters.
+- Filters are answered by intersecting posting sets, never by scanning nodes.
+- Hot reload: a watcher polls the file's mtime/size, rebuilds a new snapshot
+  off the request path and swaps it in with a single reference assignment.
+  A build that is not a JSON array of node objects, or fails to index, is
+  logged and skipped: the last good snapshot keeps serving.
+  Handlers grab one snapshot per request, so they never see a half-built index.
+- Every node is serialized to JSON bytes once per snapshot (orjson when installed);
+  list bodies are assembled by joining those bytes and kept in a small LRU.
+- Each snapshot also carries a BM25 token index for /search (api/codex_search.py).
+"""
+
+import os, json, hashlib, logging, threading, time
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional fast encoder
+    orjson = None
+
+from api.codex_search import SearchIndex
+
+log = logging.getLogger(__name__)
+
+SAFETY_KEYS = ("ptsd_true", "with_care")
+
+def dumps(obj) -> bytes:
+    """Compact UTF-8 JSON, byte-compatible with FastAPI's JSONResponse."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+def _joined(value) -> str:
+    """Element/planet may be a string or a list; match against one string."""
+    if isinstance(value, str):
+        return value
+    return " / ".join(value or [])
+
+def _cultures(node: dict) -> Set[str]:
+    gg = (node.get("gods", []) or []) + (node.get("goddesses", []) or [])
+    return {g.get("culture") for g in gg if isinstance(g, dict) and g.get("culture")}
+
+def _safety(node: dict) -> Optional[str]:
+    s = (node.get("healing_profile", {}) or {}).get("ptsd_safe")
+    if s is True:
+        return "ptsd_true"
+    if s == "with care":
+        return "with_care"
+    return None
+
+class CodexSnapshot:
+    """One immutable build of the codex and its indexes."""
+
+    def __init__(self, nodes: List[dict], version: str = "", loaded_at: float = 0.0):
+        self.nodes = nodes
+        self.version = version
+        self.loaded_at = loaded_at
+        self.encoded: List[bytes] = [dumps(n) for n in nodes]
+        self.search = SearchIndex(nodes)
+        self.by_id: Dict[int, dict] = {}
+        self.position: Dict[int, int] = {}
+        # substring-matched fields: joined value -> positions
+        self.element: Dict[str, Set[int]] = {}
+        self.planet: Dict[str, Set[int]] = {}
+        self.zodiac: Dict[str, Set[int]] = {}
+        # exact-matched fields: value -> positions
+        self.fusion_tags: Dict[str, Set[int]] = {}
+        self.culture: Dict[str, Set[int]] = {}
+        self.ptsd_safe: Dict[str, Set[int]] = {k: set() for k in SAFETY_KEYS}
+
+        for pos, n in enumerate(nodes):
+            nid = n.get("node_id")
+            if nid not in self.by_id:
+                self.by_id[nid] = n
+                self.position[nid] = pos
+            self.element.setdefault(_joined(n.get("element")), set()).add(pos)
+            self.planet.setdefault(_joined(n.get("planet")), set()).add(pos)
+            self.zodiac.setdefault(_joined(n.get("zodiac")), set()).add(pos)
+            for tag in n.get("fusion_tags", []) or []:
+                self.fusion_tags.setdefault(tag, set()).add(pos)
+            for c in _cultures(n):
+                self.culture.setdefault(c, set()).add(pos)
+            s = _safety(n)
+            if s:
+                self.ptsd_safe[s].add(pos)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def get(self, node_id: int) -> Optional[dict]:
+        return self.by_id.get(node_id)
+
+    @staticmethod
+    def _contains(index: Dict[str, Set[int]], needle: str) -> Set[int]:
+        """Union of postings whose key contains needle (keys are few)."""
+        out: Set[int] = set()
+        for key, posting in index.items():
+            if needle in key:
+                out |= posting
+        return out
+
+    def _postings(
+        self,
+        element: Optional[str] = None,
+        planet: Optional[str] = None,
+        zodiac: Optional[str] = None,
+        safety: Optional[str] = None,
+        tag: Optional[str] = None,
+        culture: Optional[str] = None,
+    ) -> List[Set[int]]:
+        """Posting sets for every active filter, smallest first."""
+        postings: List[Set[int]] = []
+        if element:
+            postings.append(self._contains(self.element, element))
+        if planet:
+            postings.append(self._contains(self.planet, planet))
+        if zodiac:
+            postings.append(self._contains(self.zodiac, zodiac))
+        if tag:
+            postings.append(self.fusion_tags.get(tag, set()))
+        if safety in self.ptsd_safe:
+            postings.append(self.ptsd_safe[safety])
+        if culture:
+            postings.append(self.culture.get(culture, set()))
+        postings.sort(key=len)
+        return postings
+
+    def select(self, **filters) -> Sequence[int]:
+        """Positions (in dataset order) of nodes matching every given filter."""
+        postings = self._postings(**filters)
+        if not postings:
+            return range(len(self.nodes))
+        hits = set(postings[0])
+        for p in postings[1:]:
+            if not hits:
+                break
+            hits &= p
+        return sorted(hits)
+
+    def scan(self, start: int = 0, **filters) -> Iterator[int]:
+        """Lazily yield matching positions from `start` on, without a full select."""
+        postings = self._postings(**filters)
+        if postings and not postings[0]:
+            return
+        for pos in range(start, len(self.nodes)):
+            if all(pos in p for p in postings):
+                yield pos
+
+    def items(self, positions: Iterable[int]) -> List[dict]:
+        return [self.nodes[p] for p in positions]
+
+    def encoded_node(self, node_id: int) -> Optional[bytes]:
+        pos = self.position.get(node_id)
+        return None if pos is None else self.encoded[pos]
+
+    def encode_at(self, pos: int, fields: Optional[Sequence[str]] = None) -> bytes:
+        """One node as JSON; projected nodes are encoded on the fly."""
+        if fields is None:
+            return self.encoded[pos]
+        n = self.nodes[pos]
+        return dumps({k: n[k] for k in fields if k in n})
+
+    def encode_items(self, positions: Iterable[int], fields: Optional[Sequence[str]] = None) -> bytes:
+        return b"[" + b",".join(self.encode_at(p, fields) for p in positions) + b"]"
+
+    def encode_list(
+        self,
+        count: Optional[int],
+        positions: Iterable[int],
+        fields: Optional[Sequence[str]] = None,
+        next_cursor: Optional[str] = None,
+    ) -> bytes:
+        """{"count":..,"items":[..],"next_cursor":..} built from the pre-serialized nodes."""
+        head = b"{" if count is None else b'{"count":%d,' % count
+        return head + b'"items":' + self.encode_items(positions, fields) + b',"next_cursor":' + dumps(next_cursor) + b"}"
+
+class ResponseCache:
+    """Thread-safe LRU of encoded response bodies."""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            body = self._data.get(key)
+            if body is not None:
+                self._data.move_to_end(key)
+            return body
+
+    def put(self, key: Hashable, body: bytes) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = body
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+def _signature(path: str) -> Tuple[int, int]:
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+class CodexStore:
+    """Holds the current snapshot; loads lazily and reloads when the file changes."""
+
+    def __init__(self, path: str, cache_size: int = 256):
+        self.path = path
+        self.responses = ResponseCache(cache_size)
+        self._snapshot: Optional[CodexSnapshot] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+    def _build(self) -> Tuple[CodexSnapshot, Tuple[int, int]]:
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"Missing {self.path}. Build the codex first.")
+        sig = _signature(self.path)
+        with open(self.path, "rb") as f:
+            raw = f.read()
+        version = hashlib.sha256(raw).hexdigest()[:16]
+        current = self._snapshot
+        if current is not None and current.version == version:
+            return current, sig
+        nodes = json.loads(raw)
+        if not isinstance(nodes, list) or not all(isinstance(n, dict) for n in nodes):
+            raise ValueError(f"{self.path}: expected a JSON array of node objects")
+        return CodexSnapshot(nodes, version, time.time()), sig
+
+    def load(self) -> CodexSnapshot:
+        with self._lock:
+            snap, sig = self._build()
+            self._snapshot, self._signature = snap, sig
+            return snap
+
+    def current(self) -> CodexSnapshot:
+        snap = self._snapshot
+        if snap is None:
+            snap = self.load()
+        return snap
+
+    def refresh(self) -> bool:
+        """Reload if the file changed on disk. Returns True when a new version was swapped in."""
+        sig = None
+        try:
+            sig = _signature(self.path)
+            if sig == self._signature:
+                return False
+            before = self._snapshot
+            snap = self.load()
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            # Half-written or malformed build: keep serving the last good snapshot
+            # until the file changes again, and keep the watcher alive.
+            log.warning("codex reload skipped: %s", e)
+            self._signature = sig or self._signature
+            return False
+        return snap is not before
+
+    def watch(self, interval: float) -> None:
+        """Poll for changes every `interval` seconds on a daemon thread."""
+        if interval <= 0 or self._watcher is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                self.refresh()
+
+        self._watcher = threading.Thread(target=run, name="codex-watch", daemon=True)
+        self._watcher.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
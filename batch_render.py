@@ -0,0 +1,67 @@
+"""Parameter grids and write-once outputs for the batch renderers.
+
+- ``expand_grid`` fills defaults and expands list-valued axes of each entry
+  into every combination.
+- ``plan_jobs`` pairs each parameter set with its output path (one job per
+  distinct path) and ``run_jobs`` renders only the paths not yet on disk.
+- ``write_once`` / ``write_atomic`` publish a file under its final name only
+  once it is complete.
+
+This module uses only the Python standard library.
+"""
+
+import itertools
+import os
+import threading
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+Job = Tuple[dict, str]
+
+def expand_grid(entries: Iterable[dict], defaults: dict, is_axis: Callable[[str, object], bool]) -> Iterator[dict]:
+    """Fill defaults and yield one parameter set per combination of the axes."""
+    for entry in entries:
+        params = {**defaults, **entry}
+        axes = {key: value for key, value in params.items() if is_axis(key, value)}
+        for combo in itertools.product(*axes.values()):
+            yield {**params, **dict(zip(axes, combo))}
+
+def plan_jobs(params: Iterable[dict], path_for: Callable[[dict], str]) -> List[Job]:
+    """(params, path) pairs in order, dropping sets that map to an already planned path."""
+    jobs, seen = [], set()
+    for p in params:
+        path = path_for(p)
+        if path not in seen:
+            seen.add(path)
+            jobs.append((p, path))
+    return jobs
+
+def run_jobs(jobs: List[Job], render_job: Callable[[Job], Tuple[str, bool]], map_fn=map,
+             key: Optional[Callable[[Job], object]] = None) -> List[Tuple[str, bool]]:
+    """Render the jobs whose output is missing (optionally sorted by `key`) with `map_fn`.
+
+    Returns (path, rendered) pairs in job order; rendered is False when the file already existed.
+    """
+    todo = [job for job in jobs if not os.path.exists(job[1])]
+    if key is not None:
+        todo.sort(key=key)
+    done = {path: False for _, path in jobs}
+    done.update(map_fn(render_job, todo))
+    return [(path, done[path]) for _, path in jobs]
+
+def write_atomic(path: str, write: Callable[[str], None]) -> None:
+    """Call write(tmp) on a temporary name next to `path`, then move it into place."""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        write(tmp)
+        os.replace(tmp, path)  # readers never see a half-written file
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+def write_once(path: str, write: Callable[[str], None]) -> bool:
+    """write_atomic unless `path` already exists; True if it was written."""
+    if os.path.exists(path):
+        return False
+    write_atomic(path, write)
+    return True
@@ -0,0 +1,268 @@
+"""Raster engine for the visionary collages.
+
+- ``Canvas`` is one contiguous RGB ``bytearray`` (a NumPy view is exposed
+  when NumPy is installed). Everything is drawn as horizontal spans, each a
+  single slice assignment.
+- Thick lines are the convex hull of a square brush at both ends (the shape
+  the old per-pixel stamping produced), filled by scanline; 1-pixel lines use
+  Bresenham runs. Circles are scanline rings and polygons use even-odd fill.
+- ``cosmic_background`` computes the wave background in bulk: NumPy when
+  available, otherwise row tables, mirrored radial terms and a byte LUT.
+- Layouts are data: ``data/collage/<name>.json`` holds ``line``, ``circle``,
+  ``polygon`` and ``graph`` shapes in canvas-relative coordinates.
+"""
+
+import json
+import math
+from array import array
+from pathlib import Path
+from typing import Iterable, List, Sequence, Tuple
+
+from png_stream import PNGWriter
+from visionary_palette import LUT_SIZE, compile_lut_list, parse_color
+
+try:
+    import numpy as np
+    from visionary_palette import apply_lut, compile_lut
+except ImportError:  # optional: bulk background
+    np = None
+
+LAYOUT_DIR = Path(__file__).resolve().parent / "data" / "collage"
+STRIP_ROWS = 256
+
+Point = Tuple[float, float]
+
+class Canvas:
+    """width x height RGB pixels in one bytearray, row-major."""
+
+    def __init__(self, width: int, height: int, color=(0, 0, 0)):
+        self.width, self.height = width, height
+        self.stride = width * 3
+        self.buf = bytearray(parse_color(color)) * (width * height)
+
+    @classmethod
+    def from_buffer(cls, width: int, height: int, data) -> "Canvas":
+        """A canvas holding a copy of `data` (width * height * 3 bytes)."""
+        canvas = cls.__new__(cls)
+        canvas.width, canvas.height, canvas.stride = width, height, width * 3
+        if len(data) != width * height * 3:
+            raise ValueError("buffer size does not match the canvas")
+        canvas.buf = bytearray(data)
+        return canvas
+
+    @property
+    def array(self):
+        """(height, width, 3) uint8 NumPy view sharing the buffer."""
+        return np.frombuffer(self.buf, dtype=np.uint8).reshape(self.height, self.width, 3)
+
+    def row(self, y: int) -> memoryview:
+        return memoryview(self.buf)[y * self.stride:(y + 1) * self.stride]
+
+    # -- spans --------------------------------------------------------------
+
+    def span(self, y: int, x0: int, x1: int, rgb: bytes) -> None:
+        """Fill pixels x0..x1 (inclusive) of row y, clipped to the canvas."""
+        if y < 0 or y >= self.height:
+            return
+        x0, x1 = max(x0, 0), min(x1, self.width - 1)
+        if x0 > x1:
+            return
+        i = y * self.stride + x0 * 3
+        self.buf[i:i + (x1 - x0 + 1) * 3] = rgb * (x1 - x0 + 1)
+
+    def spans(self, spans: Iterable[Tuple[int, int, int]], color) -> None:
+        rgb = bytes(parse_color(color))
+        for y, x0, x1 in spans:
+            self.span(y, x0, x1, rgb)
+
+    # -- shapes -------------------------------------------------------------
+
+    def line(self, x0: float, y0: float, x1: float, y1: float, color, width: float = 1) -> None:
+        if width <= 1:
+            self.spans(bresenham_spans(round(x0), round(y0), round(x1), round(y1)), color)
+            return
+        h = width / 2
+        corners = [(x + dx, y + dy) for x, y in ((x0, y0), (x1, y1)) for dx in (-h, h) for dy in (-h, h)]
+        self.spans(convex_spans(convex_hull(corners), self.height), color)
+
+    def circle(self, cx: float, cy: float, r: float, color, width: float = 1, fill: bool = False) -> None:
+        outer = r if fill else r + width / 2
+        inner = -1.0 if fill else r - width / 2
+        self.spans(ring_spans(cx, cy, outer, inner, self.height), color)
+
+    def polygon(self, points: Sequence[Point], color, width: float = 1, fill: bool = False) -> None:
+        if fill:
+            self.spans(polygon_spans(points, self.height), color)
+            return
+        for i, (x0, y0) in enumerate(points):
+            x1, y1 = points[(i + 1) % len(points)]
+            self.line(x0, y0, x1, y1, color, width)
+
+    # -- output -------------------------------------------------------------
+
+    def save_png(self, path: str, level: int = 6) -> None:
+        with PNGWriter(path, self.width, self.height, level=level) as png:
+            view = memoryview(self.buf)
+            step = STRIP_ROWS * self.stride
+            for i in range(0, len(view), step):
+                png.write_rows(view[i:i + step])
+
+# -- span generators -------------------------------------------------------
+
+def bresenham_spans(x0: int, y0: int, x1: int, y1: int):
+    """1-pixel line as (y, x_start, x_end) runs of the Bresenham walk."""
+    dx, dy = abs(x1 - x0), -abs(y1 - y0)
+    sx, sy = (1 if x0 < x1 else -1), (1 if y0 < y1 else -1)
+    err = dx + dy
+    start = x0
+    while x0 != x1 or y0 != y1:
+        e2 = 2 * err
+        px, py = x0, y0
+        if e2 >= dy:
+            err += dy
+            x0 += sx
+        if e2 <= dx:
+            err += dx
+            y0 += sy
+        if y0 != py:
+            yield py, min(start, px), max(start, px)
+            start = x0
+    yield y0, min(start, x0), max(start, x0)
+
+def convex_hull(points: List[Point]) -> List[Point]:
+    """Monotone chain, counter-clockwise."""
+    pts = sorted(set(points))
+    if len(pts) < 3:
+        return pts
+
+    def cross(o, a, b):
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    lower, upper = [], []
+    for p in pts:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], p) <= 0:
+            lower.pop()
+        lower.append(p)
+    for p in reversed(pts):
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], p) <= 0:
+            upper.pop()
+        upper.append(p)
+    return lower[:-1] + upper[:-1]
+
+def convex_spans(hull: Sequence[Point], height: int):
+    """Pixels whose centres lie inside a convex polygon, one span per row."""
+    ys = [p[1] for p in hull]
+    edges = list(zip(hull, hull[1:] + hull[:1]))
+    for y in range(max(math.ceil(min(ys)), 0), min(math.floor(max(ys)), height - 1) + 1):
+        xs = []
+        for (ax, ay), (bx, by) in edges:
+            if ay == by:
+                if ay == y:
+                    xs += (ax, bx)
+            elif min(ay, by) <= y <= max(ay, by):
+                xs.append(ax + (y - ay) * (bx - ax) / (by - ay))
+        if xs:
+            yield y, math.ceil(min(xs)), math.floor(max(xs))
+
+def ring_spans(cx: float, cy: float, outer: float, inner: float, height: int):
+    """Pixels with inner < distance <= outer from (cx, cy), as row spans."""
+    for y in range(max(math.ceil(cy - outer), 0), min(math.floor(cy + outer), height - 1) + 1):
+        dy2 = (y - cy) ** 2
+        xo = math.sqrt(max(outer * outer - dy2, 0.0))
+        left, right = math.ceil(cx - xo), math.floor(cx + xo)
+        if inner > 0 and dy2 < inner * inner:
+            xi = math.sqrt(inner * inner - dy2)
+            yield y, left, math.ceil(cx - xi) - 1
+            yield y, math.floor(cx + xi) + 1, right
+        else:
+            yield y, left, right
+
+def polygon_spans(points: Sequence[Point], height: int):
+    """Even-odd scanline fill of any simple or self-intersecting polygon."""
+    edges = list(zip(points, list(points[1:]) + list(points[:1])))
+    ys = [p[1] for p in points]
+    for y in range(max(math.ceil(min(ys)), 0), min(math.floor(max(ys)), height - 1) + 1):
+        xs = sorted(ax + (y - ay) * (bx - ax) / (by - ay)
+                    for (ax, ay), (bx, by) in edges
+                    if (ay <= y < by) or (by <= y < ay))
+        for a, b in zip(xs[::2], xs[1::2]):
+            yield y, math.ceil(a), math.floor(b)
+
+# -- background ------------------------------------------------------------
+
+def _wave(X, Y, R, T, sin, cos):
+    return sin(3 * R) + cos(4 * T) + sin(2 * (X + Y)) + cos(3 * (X - Y))
+
+def cosmic_background(canvas: Canvas, stops) -> None:
+    """Fill the canvas with the layered wave pattern mapped through `stops`."""
+    w, h = canvas.width, canvas.height
+    if np is not None:
+        x = np.linspace(-np.pi, np.pi, w, dtype=np.float32)
+        pattern = np.empty((h, w), dtype=np.float32)
+        for y0 in range(0, h, STRIP_ROWS):
+            y = np.linspace(-np.pi, np.pi, h, dtype=np.float32)[y0:y0 + STRIP_ROWS]
+            X, Y = np.meshgrid(x, y)
+            pattern[y0:y0 + len(y)] = _wave(X, Y, np.hypot(X, Y), np.arctan2(Y, X), np.sin, np.cos)
+        lut, lo, hi, rgb = compile_lut(tuple(stops)), float(pattern.min()), float(pattern.max()), canvas.array
+        for y0 in range(0, h, STRIP_ROWS):
+            apply_lut(pattern[y0:y0 + STRIP_ROWS], lut, lo, hi, out=rgb[y0:y0 + STRIP_ROWS])
+        return
+
+    xs = [-math.pi + 2 * math.pi * i / (w - 1) for i in range(w)]
+    half = (w + 1) // 2
+    # sin(2(x+y)) and cos(3(x-y)) split into per-column and per-row factors
+    s2x, c2x = [math.sin(2 * x) for x in xs], [math.cos(2 * x) for x in xs]
+    s3x, c3x = [math.sin(3 * x) for x in xs], [math.cos(3 * x) for x in xs]
+    values = array("d")
+    for j in range(h):
+        y = -math.pi + 2 * math.pi * j / (h - 1)
+        # The radial terms are mirror-symmetric in x: compute half a row.
+        left = [math.sin(3 * math.hypot(x, y)) + math.cos(4 * math.atan2(y, x)) for x in xs[:half]]
+        radial = left + left[:w - half][::-1]
+        s2y, c2y, s3y, c3y = math.sin(2 * y), math.cos(2 * y), math.sin(3 * y), math.cos(3 * y)
+        values.extend([r + a * c2y + b * s2y + c * c3y + d * s3y
+                       for r, a, b, c, d in zip(radial, s2x, c2x, c3x, s3x)])
+    lo, hi = min(values), max(values)
+    scale = (LUT_SIZE - 1) / (hi - lo) if hi > lo else 0.0
+    lut = [bytes(c) for c in compile_lut_list(tuple(stops))]
+    for j in range(h):
+        row = values[j * w:(j + 1) * w]
+        canvas.row(j)[:] = b"".join([lut[int((v - lo) * scale + 0.5)] for v in row])
+
+# -- layouts ---------------------------------------------------------------
+
+def load_layout(name: str) -> dict:
+    """A layout by name (data/collage/<name>.json) or path."""
+    path = Path(name) if name.endswith(".json") else LAYOUT_DIR / f"{name}.json"
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def draw_layout(canvas: Canvas, layout: dict) -> None:
+    """Draw every shape of a layout; sizes and widths are fractions of the shorter side."""
+    w, h = canvas.width, canvas.height
+    unit = min(w, h)
+
+    def px(p):
+        return int(p[0] * w), int(p[1] * h)
+
+    for shape in layout["shapes"]:
+        color = shape.get("color", "#FFFFFF")
+        width = shape.get("width", 0.0) * unit
+        fill = shape.get("fill", False)
+        kind = shape["type"]
+        if kind == "line":
+            (x0, y0), (x1, y1) = px(shape["points"][0]), px(shape["points"][1])
+            canvas.line(x0, y0, x1, y1, color, width)
+        elif kind == "circle":
+            cx, cy = px(shape["center"])
+            canvas.circle(cx, cy, shape["radius"] * unit, color, width, fill)
+        elif kind == "polygon":
+            canvas.polygon([px(p) for p in shape["points"]], color, width, fill)
+        elif kind == "graph":
+            nodes = [px(p) for p in shape["nodes"]]
+            for a, b in shape["edges"]:
+                canvas.line(*nodes[a], *nodes[b], color, width)
+            for cx, cy in nodes:
+                canvas.circle(cx, cy, shape["radius"] * unit, color, width)
+        else:
+            raise ValueError(f"unknown shape type {kind!r}")
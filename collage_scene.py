@@ -0,0 +1,268 @@
+"""Declarative collage scenes and a batch compositor.
+
+A scene is JSON::
+
+    {
+      "name": "tree_gold",
+      "size": 2048,                       # or [[width, height]], or a list of variants
+      "palette": "collage",               # default for background layers
+      "background": [
+        {"type": "waves"},
+        {"type": "pattern", "pattern": "radial", "palette": "alex_grey", "opacity": 0.35}
+      ],
+      "overlays": [
+        {"layout": "tree_of_life"},
+        {"layout": "alchemical", "color": "#FFD700"},
+        {"registry": "cathedral_visionary_v1", "forms": ["vesica"], "width": 0.002},
+        {"shapes": [{"type": "circle", "center": [0.5, 0.5], "radius": 0.45, "width": 0.003}]}
+      ]
+    }
+
+- Background layers: ``waves`` (the collage wave field), ``pattern`` (a
+  world-builder pattern: radial, fractal, perlin; needs NumPy) and ``solid``.
+  ``opacity`` below 1 blends onto the layers beneath (needs NumPy).
+- Overlays: a ``layout`` from data/collage, ``shapes`` inline, or
+  ``registry``: the geometry of a REGISTRY/universal.json ruleset (forms such
+  as octagon, hexagram, vesica, cube, plus the double tree). ``color`` and
+  ``width`` override the shapes' own.
+- List-valued ``size`` and ``palette`` expand into one scene per combination,
+  so a file can describe hundreds of variants. Each ``size`` variant is an
+  integer (a square) or ``[w, h]`` (a rectangle): ``[1024, 2048]`` is two
+  squares and ``[[300, 200]]`` is one 300x200 rectangle.
+- Scenes render on a thread pool (NumPy and zlib release the GIL). Finished
+  backgrounds are cached by (size, layers), and concurrent scenes that need
+  the same one wait for a single render.
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from batch_render import expand_grid, plan_jobs, run_jobs, write_once
+from collage_engine import Canvas, cosmic_background, draw_layout, load_layout, np
+from visionary_palette import load_palettes, parse_color
+
+REGISTRY_PATH = Path(__file__).resolve().parent / "REGISTRY" / "universal.json"
+SCENE_DEFAULTS = {
+    "name": "scene",
+    "size": 2048,
+    "palette": "collage",
+    "background": [{"type": "waves"}],
+    "overlays": [{"layout": "tree_of_life"}, {"layout": "alchemical"}],
+}
+VARIANT_KEYS = ("size", "palette")
+
+# -- scenes ----------------------------------------------------------------
+
+def load_scenes(path: str) -> List[dict]:
+    """Scenes from a JSON file holding one scene or a list of them."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data if isinstance(data, list) else [data]
+
+def expand_scenes(entries: Iterable[dict]) -> Iterator[dict]:
+    """Fill defaults and expand list-valued size/palette into every combination."""
+    return expand_grid(entries, SCENE_DEFAULTS, lambda key, value: key in VARIANT_KEYS and isinstance(value, list))
+
+def scene_size(scene: dict) -> Tuple[int, int]:
+    """(width, height) of an expanded scene whose size is ``n`` or ``[w, h]``."""
+    size = scene["size"]
+    if isinstance(size, int):
+        return size, size
+    if isinstance(size, list) and len(size) == 2 and all(isinstance(v, int) for v in size):
+        return size[0], size[1]
+    raise ValueError(f"scene size must be an integer or [width, height], got {size!r}")
+
+def background_layers(scene: dict) -> List[dict]:
+    """Background layers with the scene palette filled in, as used for caching."""
+    return [{"palette": scene["palette"], **layer} if layer.get("type", "waves") != "solid" else dict(layer)
+            for layer in scene["background"]]
+
+def scene_digest(scene: dict) -> str:
+    """Stable hash of everything that affects the rendered image."""
+    keys = {"size": scene_size(scene), "background": background_layers(scene), "overlays": scene["overlays"]}
+    return hashlib.sha256(json.dumps(keys, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+def output_path(scene: dict, out_dir: str) -> str:
+    w, h = scene_size(scene)
+    return os.path.join(out_dir, f"{scene['name']}_{w}x{h}_{scene['palette']}-{scene_digest(scene)}.png")
+
+# -- backgrounds -----------------------------------------------------------
+
+def _render_layer(layer: dict, width: int, height: int) -> Canvas:
+    kind = layer.get("type", "waves")
+    if kind == "solid":
+        return Canvas(width, height, layer.get("color", "#000000"))
+    canvas = Canvas(width, height)
+    if kind == "waves":
+        cosmic_background(canvas, load_palettes()[layer["palette"]])
+    elif kind == "pattern":
+        if np is None:
+            raise RuntimeError("pattern layers need NumPy")
+        from visionary_palette import palette_lut
+        from visionary_world_builder import PATTERNS, render_strips
+        rgb = canvas.array
+        for y0, strip in render_strips(width, height, PATTERNS[layer.get("pattern", "radial")],
+                                       palette_lut(layer["palette"]), layer.get("seed"), workers=1):
+            rgb[y0:y0 + len(strip)] = strip
+    else:
+        raise ValueError(f"unknown background layer type {kind!r}")
+    return canvas
+
+def render_background(layers: List[dict], width: int, height: int) -> Canvas:
+    """Composite background layers bottom to top."""
+    base = Canvas(width, height)
+    for layer in layers:
+        opacity = float(layer.get("opacity", 1.0))
+        if opacity <= 0:
+            continue
+        top = _render_layer(layer, width, height)
+        if opacity >= 1:
+            base = top
+            continue
+        if np is None:
+            raise RuntimeError("layer opacity needs NumPy")
+        dst = base.array
+        blend = dst.astype(np.float32)
+        blend *= 1 - opacity
+        blend += top.array.astype(np.float32) * opacity
+        np.rint(blend, out=blend)
+        dst[...] = blend
+    return base
+
+class BackgroundCache:
+    """LRU of finished backgrounds; a miss renders once while other threads wait on it."""
+
+    def __init__(self, capacity: int = 8):
+        self.capacity = capacity
+        self.hits = self.misses = 0
+        self._entries: "OrderedDict[tuple, Future]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, layers: List[dict], width: int, height: int) -> bytes:
+        key = (width, height, json.dumps(layers, sort_keys=True))
+        with self._lock:
+            future = self._entries.get(key)
+            owner = future is None
+            if owner:
+                self.misses += 1
+                future = self._entries[key] = Future()
+                while len(self._entries) > self.capacity:
+                    self._entries.popitem(last=False)
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+        if owner:
+            try:
+                future.set_result(bytes(render_background(layers, width, height).buf))
+            except BaseException as exc:
+                with self._lock:
+                    self._entries.pop(key, None)
+                future.set_exception(exc)
+        return future.result()
+
+# -- overlays --------------------------------------------------------------
+
+def _regular(cx: float, cy: float, r: float, n: int, start_deg: float) -> List[List[float]]:
+    return [[cx + r * math.cos(math.radians(start_deg + 360 * i / n)),
+             cy + r * math.sin(math.radians(start_deg + 360 * i / n))] for i in range(n)]
+
+def _form_shapes(form: str) -> List[dict]:
+    """Centred sacred-geometry forms in canvas-relative coordinates."""
+    if form == "octagon":
+        return [{"type": "polygon", "points": _regular(0.5, 0.5, 0.42, 8, 22.5)}]
+    if form == "hexagram":
+        return [{"type": "polygon", "points": _regular(0.5, 0.5, 0.36, 3, -90)},
+                {"type": "polygon", "points": _regular(0.5, 0.5, 0.36, 3, 90)}]
+    if form == "vesica":
+        return [{"type": "circle", "center": [0.4, 0.5], "radius": 0.2},
+                {"type": "circle", "center": [0.6, 0.5], "radius": 0.2}]
+    if form == "cube":
+        hexagon = _regular(0.5, 0.5, 0.22, 6, 30)
+        spokes = [{"type": "line", "points": [[0.5, 0.5], hexagon[i]]} for i in (1, 3, 5)]
+        return [{"type": "polygon", "points": hexagon}] + spokes
+    raise ValueError(f"unknown geometry form {form!r}")
+
+def registry_layout(ruleset: str, forms: Optional[List[str]] = None, registry: Path = REGISTRY_PATH) -> dict:
+    """Overlay shapes for a REGISTRY/universal.json ruleset's geometry."""
+    with open(registry, "r", encoding="utf-8") as f:
+        geometry = json.load(f)["rulesets"][ruleset].get("geometry", {})
+    shapes = []
+    for form in forms if forms is not None else geometry.get("forms", []):
+        shapes += _form_shapes(form)
+    if forms is None and geometry.get("double_tree"):
+        tree = load_layout("tree_of_life")["shapes"]
+        mirrored = [{**s, "nodes": [[x, 1 - y] for x, y in s["nodes"]]} for s in tree if s["type"] == "graph"]
+        shapes += tree + mirrored
+    return {"shapes": shapes}
+
+def overlay_layout(overlay: dict) -> dict:
+    if "layout" in overlay:
+        layout = load_layout(overlay["layout"])
+    elif "registry" in overlay:
+        layout = registry_layout(overlay["registry"], overlay.get("forms"))
+    elif "shapes" in overlay:
+        layout = {"shapes": overlay["shapes"]}
+    else:
+        raise ValueError(f"overlay needs layout, registry or shapes: {overlay!r}")
+    overrides = {k: overlay[k] for k in ("color", "width") if k in overlay}
+    if "color" in overrides:
+        parse_color(overrides["color"])
+    return {"shapes": [{**shape, **overrides} for shape in layout["shapes"]]} if overrides else layout
+
+# -- compositor ------------------------------------------------------------
+
+def render_scene(scene: dict, cache: Optional[BackgroundCache] = None) -> Canvas:
+    width, height = scene_size(scene)
+    layers = background_layers(scene)
+    if cache is None:
+        canvas = render_background(layers, width, height)
+    else:
+        canvas = Canvas.from_buffer(width, height, cache.get(layers, width, height))
+    for overlay in scene["overlays"]:
+        draw_layout(canvas, overlay_layout(overlay))
+    return canvas
+
+def _render_job(job: Tuple[dict, str], cache: BackgroundCache) -> Tuple[str, bool]:
+    scene, path = job
+    return path, write_once(path, lambda tmp: render_scene(scene, cache).save_png(tmp))
+
+def render_scenes(scenes: Iterable[dict], out_dir: str = ".", workers: Optional[int] = None,
+                  cache: Optional[BackgroundCache] = None) -> List[Tuple[str, bool]]:
+    """Render every (expanded) scene to `out_dir`, in parallel.
+
+    Returns (path, rendered) pairs; rendered is False when the file already existed.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    cache = cache or BackgroundCache()
+    jobs = plan_jobs(expand_scenes(scenes), lambda scene: output_path(scene, out_dir))
+    # Scenes sharing a background run back to back, so the LRU keeps hitting.
+    background = lambda job: json.dumps([scene_size(job[0]), background_layers(job[0])], sort_keys=True)
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        return run_jobs(jobs, lambda job: _render_job(job, cache), pool.map, key=background)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Render collage scene files")
+    parser.add_argument("scenes", nargs="+", help="scene JSON files (one scene or a list each)")
+    parser.add_argument("--out-dir", default="collages", help="directory for rendered PNGs")
+    parser.add_argument("--jobs", type=int, default=None, help="parallel render threads (default: CPU count)")
+    parser.add_argument("--cache", type=int, default=8, help="backgrounds kept in memory")
+    args = parser.parse_args()
+
+    scenes = [scene for path in args.scenes for scene in load_scenes(path)]
+    cache = BackgroundCache(args.cache)
+    results = render_scenes(scenes, args.out_dir, args.jobs, cache)
+    for path, rendered in results:
+        print(f"{'rendered' if rendered else 'cached  '} {path}")
+    print(f"{sum(r for _, r in results)} rendered, {len(results)} scenes, "
+          f"background cache {cache.hits} hits / {cache.misses} misses")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Endless generative soundtrack, synthesized and played block by block.
+
+- ``GenerativeSynth`` wanders through a ``harmonic_dream.SCALES`` scale and
+  voices a chord (or a single melody line, ``chord="none"``) every few beats.
+  Notes overlap through their ADSR release and are mixed into fixed-size
+  int16 blocks from ``harmonic_dream.wavetable``, so memory stays constant
+  however long it plays.
+- ``SoundtrackPlayer`` double-buffers two preallocated pygame Sounds on one
+  mixer channel: while one block plays the other is queued with
+  ``Channel.queue``, and a background thread refills whichever finished.
+  Build the synth at ``pygame.mixer.get_init()[0]``; any channel count works.
+- Run as a script to render a stretch of the soundtrack to a WAV file.
+"""
+
+import argparse
+import math
+import random
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from harmonic_dream import (CHORDS, HEADROOM, SAMPLE_RATE, SCALES, TWO_PI, chord_tones, wavetable,
+                            write_wav_stream)
+
+try:
+    import pygame
+    import pygame.sndarray
+except ImportError:  # optional: only the player needs it
+    pygame = None
+
+PAD_ADSR = (0.4, 0.3, 0.6, 1.2)  # attack s, decay s, sustain level, release s
+BLOCK = 4096  # samples per buffer (~93 ms at 44.1 kHz)
+STEPS = (-2, -1, -1, 0, 1, 1, 2)  # random-walk moves between chord roots, in scale degrees
+
+class GenerativeSynth:
+    """Infinite stream of int16 blocks of a slowly wandering chord progression."""
+
+    def __init__(self, scale: str = "pentatonic", chord: str = "triad", bpm: float = 60, beats_per_chord: int = 2,
+                 block: int = BLOCK, sample_rate: int = SAMPLE_RATE,
+                 envelope: Sequence[float] = PAD_ADSR, seed: Optional[int] = None):
+        if scale not in SCALES or chord not in CHORDS:
+            raise ValueError(f"unknown scale {scale!r} or chord {chord!r}")
+        self.scale, self.chord = scale, chord
+        self.block, self.sample_rate = block, sample_rate
+        self.hold = int(sample_rate * 60 / bpm) * beats_per_chord  # samples until release
+        attack, decay, sustain, release = envelope
+        a, d, r = (int(t * sample_rate) for t in (attack, decay, release))
+        if a + d > self.hold:
+            a, d = int(a * self.hold / (a + d)), int(d * self.hold / (a + d))
+        self._env_x = (0, a, a + d, self.hold, self.hold + r)
+        self._env_y = (0.0, 1.0, sustain, sustain, 0.0)
+        self._length = self.hold + r
+        self._rng = random.Random(seed)
+        self._degrees = 2 * len(SCALES[scale])  # roots wander over two octaves
+        self._root = 0
+        self._notes: List[Tuple[int, List[float]]] = []  # (start sample, frequencies)
+        self._next_onset = 0
+        self._t = 0
+        # Each chord still rings through its release while the next ones start.
+        self._gain = 32767 * HEADROOM / (len(CHORDS[chord]) * (1 + math.ceil(r / self.hold)))
+
+    def _next_root(self) -> int:
+        root = self._root + self._rng.choice(STEPS)
+        self._root = min(max(root, 0), self._degrees - 1)
+        return self._root
+
+    def next_block(self) -> np.ndarray:
+        t, n = self._t, self.block
+        end = t + n
+        while self._next_onset < end:
+            self._notes.append((self._next_onset, chord_tones(self.scale, self._next_root(), self.chord)))
+            self._next_onset += self.hold
+        mix = np.zeros(n, dtype=np.float64)
+        ramp = np.arange(n, dtype=np.float64)
+        for start, freqs in self._notes:
+            k0 = t - start
+            env = np.interp(ramp + k0, self._env_x, self._env_y)
+            voices = np.zeros(n, dtype=np.float64)
+            for freq in freqs:
+                sin, cos = wavetable(freq, n, self.sample_rate)
+                # sin(w(k0 + k)) from the cached ramp, shifted by this block's offset
+                phase = (TWO_PI * freq / self.sample_rate * k0) % TWO_PI
+                voices += math.sin(phase) * cos + math.cos(phase) * sin
+            mix += env * voices
+        self._notes = [note for note in self._notes if note[0] + self._length > end]
+        self._t = end
+        mix *= self._gain
+        np.clip(mix, -32768, 32767, out=mix)
+        return mix.astype(np.int16)
+
+    def blocks(self, count: int):
+        for _ in range(count):
+            yield self.next_block()
+
+class SoundtrackPlayer:
+    """Stream a synth through one mixer channel with two alternating Sound buffers."""
+
+    def __init__(self, synth: GenerativeSynth, channel=None, volume: float = 1.0):
+        if pygame is None:
+            raise RuntimeError("SoundtrackPlayer needs pygame")
+        rate, size, channels = pygame.mixer.get_init()
+        if rate != synth.sample_rate or size != -16:
+            raise ValueError(f"mixer runs at {rate} Hz / {size} bit; the synth needs {synth.sample_rate} Hz / -16")
+        self.synth = synth
+        self.channel = channel or pygame.mixer.Channel(0)
+        self.channel.set_volume(volume)
+        self.sounds = [pygame.mixer.Sound(buffer=bytes(synth.block * 2 * channels)) for _ in range(2)]
+        # Writable views onto each Sound's own samples: blocks are written in place, never reallocated.
+        self._views = [pygame.sndarray.samples(s).reshape(-1, channels) for s in self.sounds]
+        self._free = 0
+        self.blocks_played = 0
+        self.underruns = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="soundtrack", daemon=True)
+
+    def _fill(self, i: int) -> None:
+        self._views[i][:] = self.synth.next_block()[:, None]
+
+    def _prime(self) -> None:
+        self._fill(0)
+        self._fill(1)
+        self.channel.play(self.sounds[0])
+        self.channel.queue(self.sounds[1])
+        self._free = 0
+        self.blocks_played += 2
+
+    def _run(self) -> None:
+        poll = self.synth.block / self.synth.sample_rate / 4
+        while not self._stop.wait(poll):
+            if not self.channel.get_busy():
+                self.underruns += 1  # both buffers ran out: restart the pair
+                self._prime()
+            elif self.channel.get_queue() is None:
+                # The queued buffer started playing, so the other one has finished: refill and queue it.
+                self._fill(self._free)
+                self.channel.queue(self.sounds[self._free])
+                self._free ^= 1
+                self.blocks_played += 1
+
+    def start(self) -> "SoundtrackPlayer":
+        self._prime()
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.channel.stop()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Render the generative soundtrack to a WAV file")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="pentatonic")
+    parser.add_argument("--chord", choices=sorted(CHORDS), default="triad")
+    parser.add_argument("--bpm", type=float, default=60, help="tempo in beats per minute")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the chord progression")
+    parser.add_argument("--seconds", type=float, default=30, help="length to render")
+    parser.add_argument("--output", default="Generative_Soundtrack.wav", help="output WAV filename")
+    args = parser.parse_args()
+
+    synth = GenerativeSynth(args.scale, args.chord, args.bpm, seed=args.seed)
+    write_wav_stream(args.output, synth.blocks(math.ceil(args.seconds * SAMPLE_RATE / synth.block)))
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,35 @@
 """Compose a simple visionary melody and save it as a WAV file.
 
-This script is self-contained and uses only the Python standard library.
+This script is self-contained and uses only the Python standard library;
+--batch also loads batch_render.py from the same directory, on first use.
+When NumPy is installed, each note is synthesized as one vectorized array.
+Audio is produced as a stream of fixed-size int16 blocks, so memory stays
+constant no matter how many bars are rendered. Chords with ADSR envelopes
+(--chord, --adsr) mix several cached voices and need NumPy.
+--batch renders a JSON manifest of parameter sets across a process pool,
+skipping any output whose parameter hash already exists on disk.
 """
 
 import argparse
+import hashlib
+import json
 import math
-import struct
+import os
+import sys
 import wave
-from typing import List
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:  # optional: vectorized synthesis
+    np = None
+
+SAMPLE_RATE = 44100
+TWO_PI = 2 * math.pi
+HEADROOM = 10 ** (-1 / 20)  # mix peaks at -1 dBFS
 
 # ---------------------------------------------------------------------------
 # Musical scales (semitone offsets from base A)
@@ -18,37 +40,286 @@ SCALES = {
     "minor": [0, 2, 3, 5, 7, 8, 10],
 }
 
+# Chords as stacks of scale degrees above each melody note
+CHORDS = {
+    "none": [0],
+    "dyad": [0, 2],
+    "triad": [0, 2, 4],
+    "seventh": [0, 2, 4, 6],
+}
+
+DEFAULT_ADSR = (0.01, 0.08, 0.7, 0.15)  # attack s, decay s, sustain level, release s
+
 def note_frequency(semitone: int, base: float = 220.0) -> float:
     """Convert semitone offset into frequency in Hz."""
 
     return base * (2 ** (semitone / 12))
 
-def render(scale: str, pattern: str, bpm: int, bars: int) -> List[int]:
-    """Create a sequence of samples for the chosen musical settings."""
+@lru_cache(maxsize=64)
+def wavetable(freq: float, n: int, sr: int = SAMPLE_RATE) -> Tuple["np.ndarray", "np.ndarray"]:
+    """sin and cos of one note's phase ramp, memoized per (frequency, length, rate).
+
+    sin(phase + x) = sin(phase)·cos(x) + cos(phase)·sin(x), so a cached ramp
+    serves a note starting at any phase. The LRU bound keeps memory flat.
+    """
+
+    x = (TWO_PI * freq / sr) * np.arange(n, dtype=np.float64)
+    sin, cos = np.sin(x), np.cos(x)
+    sin.flags.writeable = False
+    cos.flags.writeable = False
+    return sin, cos
+
+def check_envelope(envelope: Sequence[float]) -> Tuple[float, float, float, float]:
+    """Validate (attack, decay, sustain, release): times >= 0 and sustain in [0, 1]."""
+
+    if len(envelope) != 4:
+        raise ValueError(f"envelope needs attack, decay, sustain and release, got {list(envelope)!r}")
+    attack, decay, sustain, release = (float(v) for v in envelope)
+    if min(attack, decay, release) < 0:
+        raise ValueError(f"envelope times must not be negative, got {list(envelope)!r}")
+    if not 0.0 <= sustain <= 1.0:
+        raise ValueError(f"envelope sustain must be between 0 and 1, got {sustain}")
+    return attack, decay, sustain, release
+
+@lru_cache(maxsize=16)
+def adsr(n: int, sr: int = SAMPLE_RATE, attack: float = 0.01, decay: float = 0.08,
+         sustain: float = 0.7, release: float = 0.15) -> "np.ndarray":
+    """Piecewise-linear ADSR envelope over n samples (segments shrink to fit short notes)."""
+
+    a, d, r = (int(t * sr) for t in (attack, decay, release))
+    if a + d + r > n:
+        k = n / (a + d + r)
+        a, d, r = int(a * k), int(d * k), int(r * k)
+    env = np.full(n, sustain, dtype=np.float64)
+    env[:a] = np.linspace(0.0, 1.0, a, endpoint=False)
+    env[a:a + d] = np.linspace(1.0, sustain, d, endpoint=False)
+    if r:
+        env[n - r:] = np.linspace(sustain, 0.0, r)
+    env.flags.writeable = False
+    return env
+
+def melody(scale: str, pattern: str, bars: int) -> List[float]:
+    """Frequencies of the quarter notes in the piece, one per beat."""
 
-    sr = 44100  # sample rate
-    beat_samples = int(sr * 60 / bpm)
     sequence = SCALES[scale]
     if pattern == "descending":
         sequence = list(reversed(sequence))
+    return [note_frequency(sequence[i % len(sequence)]) for i in range(bars * 4)]
 
-    samples: List[int] = []
-    for i in range(bars * 4):
-        semitone = sequence[i % len(sequence)]
-        freq = note_frequency(semitone)
-        for n in range(beat_samples):
-            sample = int(32767 * math.sin(2 * math.pi * freq * n / sr))
-            samples.append(sample)
-    return samples
+def chord_tones(scale: str, root: int, chord: str) -> List[float]:
+    """Frequencies of `chord` stacked on scale degree `root`; degrees past the scale climb octaves."""
 
-def write_wav(filename: str, samples: List[int]) -> None:
-    """Write samples to a mono 16-bit WAV file."""
+    steps = SCALES[scale]
+    tones = []
+    for stack in CHORDS[chord]:
+        octave, degree = divmod(root + stack, len(steps))
+        tones.append(note_frequency(steps[degree] + 12 * octave))
+    return tones
+
+def chord_frequencies(scale: str, pattern: str, bars: int, chord: str) -> List[List[float]]:
+    """Per beat, the frequencies of the chord built on that beat's melody degree."""
+
+    degrees = list(range(len(SCALES[scale])))
+    if pattern == "descending":
+        degrees.reverse()
+    return [chord_tones(scale, degrees[i % len(degrees)], chord) for i in range(bars * 4)]
+
+def _beats_numpy(freqs: Sequence[float], beat_samples: int, sr: int) -> Iterator:
+    phase = 0.0
+    for freq in freqs:
+        sin, cos = wavetable(freq, beat_samples, sr)
+        block = np.empty(beat_samples, dtype=np.int16)
+        # Start each note where the previous one stopped so the joins don't click.
+        block[:] = 32767 * (math.sin(phase) * cos + math.cos(phase) * sin)
+        yield block
+        phase = (phase + TWO_PI * freq / sr * beat_samples) % TWO_PI
+
+def _beats_mixed(chords: Sequence[Sequence[float]], beat_samples: int, sr: int,
+                 envelope: Sequence[float]) -> Iterator:
+    """Sum every chord tone from the wavetable cache, shape it with ADSR, keep headroom."""
+
+    env = adsr(beat_samples, sr, *envelope)
+    mix = np.empty(beat_samples, dtype=np.float64)
+    for tones in chords:
+        mix[:] = 0.0
+        for freq in tones:
+            mix += wavetable(freq, beat_samples, sr)[0]
+        # N unit sines can peak at N: scale by 1/N, then apply envelope and headroom.
+        mix *= env * (32767 * HEADROOM / len(tones))
+        np.clip(mix, -32768, 32767, out=mix)
+        yield mix.astype(np.int16)
+
+def _beats_python(freqs: Sequence[float], beat_samples: int, sr: int) -> Iterator[array]:
+    phase = 0.0
+    for freq in freqs:
+        step = TWO_PI * freq / sr
+        yield array("h", (int(32767 * math.sin(phase + step * n)) for n in range(beat_samples)))
+        phase = (phase + step * beat_samples) % TWO_PI
+
+def _rechunk(blocks: Iterable, size: int) -> Iterator:
+    """Regroup a block stream into blocks of exactly `size` samples (last may be short)."""
+    pending = None
+    for block in blocks:
+        if pending is None or not len(pending):
+            pending = block
+        elif np is not None and isinstance(pending, np.ndarray):
+            pending = np.concatenate((pending, block))
+        else:
+            pending = pending + block
+        while len(pending) >= size:
+            yield pending[:size]
+            pending = pending[size:]
+    if pending is not None and len(pending):
+        yield pending
+
+def _use_numpy(backend: str) -> bool:
+    if backend == "numpy" and np is None:
+        raise RuntimeError("backend 'numpy' requested but NumPy is not installed")
+    return np is not None and backend != "python"
+
+def render_blocks(
+    scale: str,
+    pattern: str,
+    bpm: int,
+    bars: int,
+    block_ms: Optional[float] = None,
+    backend: str = "auto",
+    chord: Optional[str] = None,
+    envelope: Optional[Sequence[float]] = None,
+) -> Iterator:
+    """Yield the piece as int16 blocks: one per beat, or one per `block_ms` milliseconds.
+
+    With `chord` or `envelope` set, each beat is a mixed chord shaped by ADSR.
+    """
+
+    sr = SAMPLE_RATE
+    beat_samples = int(sr * 60 / bpm)
+    if chord is not None or envelope is not None:
+        if np is None or backend == "python":
+            raise RuntimeError("chords and envelopes need the NumPy backend")
+        chords = chord_frequencies(scale, pattern, bars, chord or "none")
+        blocks = _beats_mixed(chords, beat_samples, sr, check_envelope(envelope or DEFAULT_ADSR))
+    else:
+        freqs = melody(scale, pattern, bars)
+        beats = _beats_numpy if _use_numpy(backend) else _beats_python
+        blocks = beats(freqs, beat_samples, sr)
+    if block_ms:
+        blocks = _rechunk(blocks, max(1, int(sr * block_ms / 1000)))
+    return blocks
+
+def render(scale: str, pattern: str, bpm: int, bars: int, backend: str = "auto"):
+    """Create a sequence of int16 samples for the chosen musical settings.
+
+    Returns a NumPy int16 array, or an ``array('h')`` when NumPy is missing
+    or ``backend="python"`` is requested.
+    """
 
+    blocks = render_blocks(scale, pattern, bpm, bars, backend=backend)
+    if _use_numpy(backend):
+        out = np.empty(int(SAMPLE_RATE * 60 / bpm) * bars * 4, dtype=np.int16)
+        pos = 0
+        for block in blocks:
+            out[pos:pos + len(block)] = block
+            pos += len(block)
+        return out
+    out = array("h")
+    for block in blocks:
+        out.extend(block)
+    return out
+
+def pcm_bytes(samples: Union[Sequence[int], "array"]) -> bytes:
+    """Little-endian int16 bytes for a sample buffer."""
+
+    if np is not None and isinstance(samples, np.ndarray):
+        return samples.astype("<i2", copy=False).tobytes()
+    if sys.byteorder == "big" or not isinstance(samples, array) or samples.typecode != "h":
+        samples = array("h", samples)  # copy, so swapping never touches the caller's buffer
+    if sys.byteorder == "big":
+        samples.byteswap()
+    return samples.tobytes()
+
+def write_wav_stream(filename: str, blocks: Iterable, sample_rate: int = SAMPLE_RATE) -> int:
+    """Stream int16 blocks into a mono 16-bit WAV file; returns frames written."""
+
+    frames = 0
     with wave.open(filename, "wb") as w:
         w.setnchannels(1)
         w.setsampwidth(2)
-        w.setframerate(44100)
-        w.writeframes(b"".join(struct.pack("<h", s) for s in samples))
+        w.setframerate(sample_rate)
+        for block in blocks:
+            w.writeframesraw(pcm_bytes(block))
+            frames += len(block)
+    return frames
+
+def write_pcm(stream, blocks: Iterable) -> None:
+    """Write raw little-endian int16 PCM blocks to a binary stream (e.g. stdout)."""
+
+    for block in blocks:
+        stream.write(pcm_bytes(block))
+        stream.flush()
+
+def write_wav(filename: str, samples, sample_rate: int = SAMPLE_RATE) -> None:
+    """Write samples to a mono 16-bit WAV file."""
+
+    write_wav_stream(filename, [samples], sample_rate)
+
+# ---------------------------------------------------------------------------
+# Batch rendering
+# ---------------------------------------------------------------------------
+PARAM_DEFAULTS = {"scale": "pentatonic", "pattern": "ascending", "bpm": 120, "bars": 4,
+                  "chord": None, "adsr": None}
+
+def expand_manifest(entries: Iterable[dict]) -> Iterator[dict]:
+    """Fill defaults and expand list-valued parameters into every combination.
+
+    ``{"scale": ["major", "minor"], "bpm": [90, 120]}`` becomes four jobs.
+    ``adsr`` is itself a list, so a grid of envelopes is a list of lists.
+    """
+
+    from batch_render import expand_grid
+
+    def is_axis(key, value):
+        if key == "adsr":
+            return bool(value) and isinstance(value[0], list)
+        return isinstance(value, list)
+
+    return expand_grid(entries, PARAM_DEFAULTS, is_axis)
+
+def params_digest(params: dict) -> str:
+    """Stable hash of everything that affects the rendered audio."""
+
+    keys = {k: params.get(k) for k in PARAM_DEFAULTS}
+    keys["sample_rate"] = SAMPLE_RATE
+    return hashlib.sha256(json.dumps(keys, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+def output_path(params: dict, out_dir: str) -> str:
+    name = params.get("name") or f"{params['scale']}_{params['pattern']}_{params['bpm']}bpm_{params['bars']}bars"
+    return os.path.join(out_dir, f"{name}-{params_digest(params)}.wav")
+
+def _render_job(job: Tuple[dict, str]) -> Tuple[str, bool]:
+    from batch_render import write_once
+
+    params, path = job
+
+    def write(tmp):
+        write_wav_stream(tmp, render_blocks(params["scale"], params["pattern"], params["bpm"], params["bars"],
+                                            chord=params.get("chord"), envelope=params.get("adsr")))
+    return path, write_once(path, write)
+
+def render_many(manifest: Iterable[dict], out_dir: str = ".", workers: Optional[int] = None) -> List[Tuple[str, bool]]:
+    """Render every parameter set in `manifest` to `out_dir`, in parallel.
+
+    Returns (path, rendered) pairs; rendered is False when the file already existed.
+    """
+
+    from batch_render import plan_jobs, run_jobs
+
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = plan_jobs(expand_manifest(manifest), lambda params: output_path(params, out_dir))
+    if workers == 1 or sum(not os.path.exists(path) for _, path in jobs) <= 1:
+        return run_jobs(jobs, _render_job)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return run_jobs(jobs, _render_job, pool.map)
 
 def main() -> None:
     parser = argparse.ArgumentParser(description=__doc__)
@@ -56,11 +327,44 @@ def main() -> None:
     parser.add_argument("--pattern", choices=["ascending", "descending"], default="ascending")
     parser.add_argument("--bpm", type=int, default=120, help="tempo in beats per minute")
     parser.add_argument("--bars", type=int, default=4, help="number of 4/4 bars")
+    parser.add_argument("--backend", choices=["auto", "numpy", "python"], default="auto",
+                        help="synthesis backend (auto uses NumPy when installed)")
+    parser.add_argument("--chord", choices=sorted(CHORDS), default=None,
+                        help="harmonize each beat and mix the voices (needs NumPy)")
+    parser.add_argument("--adsr", type=float, nargs=4, metavar=("A", "D", "S", "R"), default=None,
+                        help="envelope: attack s, decay s, sustain level, release s (needs NumPy)")
+    parser.add_argument("--block-ms", type=float, default=None,
+                        help="stream in blocks of this many milliseconds (default: one per beat)")
+    parser.add_argument("--raw", action="store_true",
+                        help="write raw s16le mono PCM to stdout instead of a WAV file")
     parser.add_argument("--output", default="Harmonic_Dream.wav", help="output WAV filename")
+    parser.add_argument("--batch", metavar="MANIFEST",
+                        help="JSON list of parameter sets to render (list values expand to every combination)")
+    parser.add_argument("--out-dir", default=".", help="directory for --batch outputs")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes for --batch (default: CPU count)")
     args = parser.parse_args()
+    if args.adsr is not None:
+        try:
+            check_envelope(args.adsr)
+        except ValueError as exc:
+            parser.error(str(exc))
+
+    if args.batch:
+        with open(args.batch, "r", encoding="utf-8") as fh:
+            manifest = json.load(fh)
+        if isinstance(manifest, dict):
+            manifest = [manifest]
+        results = render_many(manifest, args.out_dir, args.jobs)
+        rendered = sum(1 for _, fresh in results if fresh)
+        print(f"{rendered} rendered, {len(results) - rendered} already up to date in {args.out_dir}")
+        return
 
-    samples = render(args.scale, args.pattern, args.bpm, args.bars)
-    write_wav(args.output, samples)
+    blocks = render_blocks(args.scale, args.pattern, args.bpm, args.bars, args.block_ms,
+                           args.backend, args.chord, args.adsr)
+    if args.raw:
+        write_pcm(sys.stdout.buffer, blocks)
+    else:
+        write_wav_stream(args.output, blocks)
 
 if __name__ == "__main__":
     main()
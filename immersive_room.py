@@ -1,54 +1,291 @@
-"""Explore an immersive room of art and generative music."""
+"""Explore an immersive room of art and generative music.
+
+Music is an endless generative soundtrack streamed block by block from a
+background thread (generative_soundtrack); ``--soundtrack tones`` plays the
+original four looping tones instead.
+
+Startup assets (the background pixels and the chord tones) are baked once
+into an on-disk cache of raw RGB / int16 files keyed by their parameters and
+memory-mapped on later launches, so a warm start does no NumPy work at all.
+If the cache directory cannot be written (e.g. a read-only home on a kiosk),
+assets are built in memory instead.
+Run with ``--prebake`` to populate the cache ahead of time (e.g. on a kiosk
+image build) for one or more window sizes.
+
+Frames are drawn with dirty rectangles: only the areas the cursor (and the
+optional timing overlay) covered are restored from the background and passed
+to ``display.update``. Per-frame timings of event handling, drawing and
+presenting are recorded; under ``SDL_VIDEODRIVER=dummy`` the room runs a
+scripted cursor path for ``--frames`` frames and prints frame-time
+percentiles, so it doubles as a benchmark::
+
+    SDL_VIDEODRIVER=dummy python immersive_room.py --width 3840 --height 2160 --frames 600 --uncapped
+"""
 
 # Import required libraries
+import argparse
+import hashlib
+import json
+import math
+import mmap
 import os
-import numpy as np
-import pygame
-from pygame import sndarray
+import sys
+import time
+from collections import deque
 from datetime import datetime
 
-def create_background(width: int, height: int) -> pygame.Surface:
-    """Generate a simple procedural background pattern."""
+import pygame
+
+from generative_soundtrack import GenerativeSynth, SoundtrackPlayer
+from harmonic_dream import CHORDS, SCALES
+
+SAMPLE_RATE = 44100
+CHORD = (261.63, 329.63, 392.00, 523.25)  # C major chord
+TONE_DURATION = 1.0
+BACKGROUND_PARAMS = {"pattern": "sin_cos", "fx": 3.0, "fy": 3.0}
+ASSET_VERSION = 1  # bump when the generators change
+CURSOR_RADIUS = 10
+FRAME_BUDGET_MS = 1000 / 60
+PHASES = ("events", "draw", "present")
+CACHE_DIR = os.environ.get("IMMERSIVE_ROOM_CACHE",
+                           os.path.join(os.path.expanduser("~"), ".cache", "immersive_room"))
+
+# -- asset generators (NumPy imported only on a cache miss) -----------------
+
+def background_pixels(width: int, height: int, fx: float = 3.0, fy: float = 3.0, pattern: str = "sin_cos"):
+    """(height, width, 3) uint8 grayscale sin/cos pattern."""
+    import numpy as np
     x = np.linspace(0, 1, width)
     y = np.linspace(0, 1, height)
     X, Y = np.meshgrid(x, y)
-    pattern = np.sin(3 * np.pi * X) * np.cos(3 * np.pi * Y)
-    norm = (pattern - pattern.min()) / (pattern.max() - pattern.min())
-    rgb = np.stack([norm * 255] * 3, axis=-1).astype(np.uint8)
-    return pygame.surfarray.make_surface(rgb)
+    wave = np.sin(fx * np.pi * X) * np.cos(fy * np.pi * Y)
+    norm = (wave - wave.min()) / (wave.max() - wave.min())
+    return np.stack([norm * 255] * 3, axis=-1).astype(np.uint8)
 
-def tone(frequency: float, duration: float = 0.5, sample_rate: int = 44100) -> pygame.mixer.Sound:
-    """Create a sine wave tone for generative music."""
+def tone_samples(frequency: float, duration: float = 0.5, sample_rate: int = SAMPLE_RATE):
+    """Mono int16 sine wave."""
+    import numpy as np
     t = np.linspace(0, duration, int(sample_rate * duration), False)
     wave = np.sin(frequency * t * 2 * np.pi)
-    audio = np.int16(wave * 32767)
-    return sndarray.make_sound(audio)
+    return np.int16(wave * 32767)
+
+# -- on-disk cache --------------------------------------------------------
+
+def asset_path(kind: str, key: dict, cache_dir: str = CACHE_DIR) -> str:
+    """Cache file for one asset: readable prefix plus a hash of every parameter."""
+    digest = hashlib.sha256(json.dumps({**key, "v": ASSET_VERSION}, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    label = "-".join(str(v) for v in key.values())
+    ext = ".rgb" if kind == "background" else ".s16"
+    return os.path.join(cache_dir, f"{kind}-{label}-{digest}{ext}")
+
+def _map(path: str, nbytes: int):
+    """Private mapping of a cache file, or None if it is missing or the wrong size."""
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size != nbytes:
+                return None
+            # copy-on-write: zero-copy until written, and writable for pygame buffers
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    except (OSError, ValueError):
+        return None
+
+def _store(path: str, data) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)  # readers never see a half-written file
+
+def cached_asset(kind: str, key: dict, nbytes: int, build, cache_dir: str = CACHE_DIR):
+    """Memory-mapped asset bytes, building and storing them on a miss.
+
+    With cache_dir None the asset is built in memory and nothing is written;
+    the same happens, with a warning, when the cache cannot be written.
+    """
+    if cache_dir is None:
+        return memoryview(build()).cast("B")
+    path = asset_path(kind, key, cache_dir)
+    buf = _map(path, nbytes)
+    if buf is None:
+        data = memoryview(build()).cast("B")
+        try:
+            _store(path, data)
+        except OSError as exc:
+            print(f"[immersive_room] asset cache unavailable, using {kind} from memory: {exc}", file=sys.stderr)
+            return data
+        buf = _map(path, nbytes)
+        if buf is None:
+            return data
+    return buf
+
+def background_asset(width: int, height: int, cache_dir: str = CACHE_DIR):
+    key = {"width": width, "height": height, **BACKGROUND_PARAMS}
+    return cached_asset("background", key, width * height * 3,
+                        lambda: background_pixels(width, height, **BACKGROUND_PARAMS), cache_dir)
+
+def tone_asset(frequency: float, duration: float = 0.5, sample_rate: int = SAMPLE_RATE, cache_dir: str = CACHE_DIR):
+    key = {"frequency": frequency, "duration": duration, "sample_rate": sample_rate}
+    return cached_asset("tone", key, int(sample_rate * duration) * 2,
+                        lambda: tone_samples(frequency, duration, sample_rate), cache_dir)
+
+def prebake(sizes, cache_dir: str = CACHE_DIR) -> list:
+    """Populate the cache for every (width, height) and the chord tones; returns the files."""
+    for width, height in sizes:
+        background_asset(width, height, cache_dir)
+    for freq in CHORD:
+        tone_asset(freq, TONE_DURATION, SAMPLE_RATE, cache_dir)
+    return ([asset_path("background", {"width": w, "height": h, **BACKGROUND_PARAMS}, cache_dir) for w, h in sizes] +
+            [asset_path("tone", {"frequency": f, "duration": TONE_DURATION, "sample_rate": SAMPLE_RATE}, cache_dir)
+             for f in CHORD])
+
+# -- pygame wrappers -------------------------------------------------------
+
+def create_background(width: int, height: int, cache_dir: str = CACHE_DIR) -> pygame.Surface:
+    """Procedural background as a surface over the (mapped) pixel bytes."""
+    return pygame.image.frombuffer(background_asset(width, height, cache_dir), (width, height), "RGB")
+
+def tone(frequency: float, duration: float = 0.5, sample_rate: int = SAMPLE_RATE,
+         cache_dir: str = CACHE_DIR) -> pygame.mixer.Sound:
+    """Sine wave tone for generative music (mixer must be mono 16-bit at sample_rate)."""
+    if pygame.mixer.get_init() != (sample_rate, -16, 1):
+        raise ValueError(f"mixer runs as {pygame.mixer.get_init()}; tones need ({sample_rate}, -16, 1)")
+    return pygame.mixer.Sound(buffer=tone_asset(frequency, duration, sample_rate, cache_dir))
+
+# -- frame timing ----------------------------------------------------------
+
+def percentile(sorted_values, q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(q / 100 * len(sorted_values)) - 1))]
+
+class FrameStats:
+    """Per-frame phase timings in milliseconds: a recent window for live display,
+    plus every frame when ``history`` is set (for the end-of-run report).
+
+    Without history only the fixed-size window is kept, so a kiosk left running
+    for days does not grow without bound; ``report`` then covers that window.
+    """
+
+    def __init__(self, window: int = 120, history: bool = True):
+        self.frames = {phase: [] for phase in PHASES + ("total",)} if history else None
+        self.recent = deque(maxlen=window)
+
+    def add(self, *phase_seconds: float) -> None:
+        ms = [t * 1000 for t in phase_seconds]
+        if self.frames is not None:
+            for phase, value in zip(PHASES, ms):
+                self.frames[phase].append(value)
+            self.frames["total"].append(sum(ms))
+        self.recent.append(ms)
+
+    def live(self) -> str:
+        """One-line summary of the recent window."""
+        if not self.recent:
+            return ""
+        n = len(self.recent)
+        means = [sum(f[i] for f in self.recent) / n for i in range(len(PHASES))]
+        worst = sorted(sum(f) for f in self.recent)
+        return ("  ".join(f"{phase} {mean:.2f}" for phase, mean in zip(PHASES, means)) +
+                f"  total p95 {percentile(worst, 95):.2f} ms")
+
+    def report(self) -> str:
+        frames = self.frames
+        if frames is None:
+            frames = {phase: [f[i] for f in self.recent] for i, phase in enumerate(PHASES)}
+            frames["total"] = [sum(f) for f in self.recent]
+        lines = [f"{len(frames['total'])} frames (ms)      p50     p95     p99     max"]
+        for phase, values in frames.items():
+            v = sorted(values)
+            lines.append(f"  {phase:<8}" + "".join(f"{percentile(v, q):8.3f}" for q in (50, 95, 99, 100)))
+        total = frames["total"]
+        within = sum(t <= FRAME_BUDGET_MS for t in total) / len(total) * 100 if total else 0.0
+        lines.append(f"  {within:.1f}% of frames within the {FRAME_BUDGET_MS:.2f} ms budget for 60 FPS")
+        return "\n".join(lines)
+
+def _size(text: str):
+    width, _, height = text.lower().partition("x")
+    return int(width), int(height)
 
 def main() -> None:
     """Run the immersive creative room."""
+    parser = argparse.ArgumentParser(description="Immersive creative room")
+    parser.add_argument("--width", type=int, default=800, help="window width")
+    parser.add_argument("--height", type=int, default=600, help="window height")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="asset cache directory (env IMMERSIVE_ROOM_CACHE)")
+    parser.add_argument("--no-cache", action="store_true", help="generate assets in memory without the disk cache")
+    parser.add_argument("--prebake", nargs="*", metavar="WxH", type=_size, default=None,
+                        help="fill the asset cache for these window sizes (default: --width x --height) and exit")
+    parser.add_argument("--frames", type=int, default=30, help="frames to run in headless (benchmark) mode")
+    parser.add_argument("--uncapped", action="store_true", help="do not limit the loop to 60 FPS")
+    parser.add_argument("--full-redraw", action="store_true",
+                        help="blit the whole background and flip every frame (for comparison)")
+    parser.add_argument("--overlay", action="store_true", help="draw live frame timings in the window")
+    parser.add_argument("--stats", action="store_true", help="log frame timings to stderr once a second")
+    parser.add_argument("--soundtrack", choices=["generative", "tones"], default="generative",
+                        help="streamed generative music, or the four cached looping tones")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="pentatonic", help="scale for the soundtrack")
+    parser.add_argument("--chord", choices=sorted(CHORDS), default="triad", help="chord voicing for the soundtrack")
+    parser.add_argument("--bpm", type=float, default=60, help="soundtrack tempo")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the soundtrack's progression")
+    args = parser.parse_args()
+    cache_dir = None if args.no_cache else args.cache_dir
+
+    if args.prebake is not None:
+        paths = prebake(args.prebake or [(args.width, args.height)], args.cache_dir)
+        for path in paths:
+            print(path)
+        if not all(os.path.exists(path) for path in paths):
+            sys.exit(f"could not write the asset cache in {args.cache_dir}")
+        return
+
+    # Tones are baked as mono 16-bit samples: hold the mixer to that format
+    # (SDL converts for the device) instead of letting it pick the device's own.
+    pygame.mixer.pre_init(SAMPLE_RATE, -16, 1, allowedchanges=0)
     pygame.init()
 
-    width, height = 800, 600
+    width, height = args.width, args.height
     screen = pygame.display.set_mode((width, height))
     pygame.display.set_caption("Immersive Creative Room")
 
-    background = create_background(width, height)
+    # convert() copies into the display's pixel format once, for fast blits
+    background = create_background(width, height, cache_dir).convert()
 
-    # Layer a simple ambient chord using looping tones
     pygame.mixer.set_num_channels(4)
-    for freq in (261.63, 329.63, 392.00, 523.25):  # C major chord
-        tone(freq, duration=1.0).play(loops=-1)
+    player = None
+    if args.soundtrack == "generative":
+        # Endless music synthesized in small blocks on a background thread, at the mixer's own rate
+        synth = GenerativeSynth(args.scale, args.chord, args.bpm, seed=args.seed,
+                                sample_rate=pygame.mixer.get_init()[0])
+        player = SoundtrackPlayer(synth).start()
+    else:
+        # Layer a simple ambient chord using looping tones
+        for freq in CHORD:
+            tone(freq, duration=TONE_DURATION, cache_dir=cache_dir).play(loops=-1)
 
     clock = pygame.time.Clock()
     pos = pygame.Vector2(width // 2, height // 2)
 
-    # Short demo mode for headless execution
+    # Short demo mode for headless execution; doubles as a benchmark
     headless = os.environ.get("SDL_VIDEODRIVER") == "dummy"
-    frame_limit = 30 if headless else None
+    frame_limit = args.frames if headless else None
     frame_count = 0
 
+    # Full history only for the bounded headless benchmark; interactive runs
+    # (even with --stats left on) keep just the live window and report on it
+    stats = FrameStats(history=bool(frame_limit))
+    font = pygame.font.Font(None, 24) if args.overlay else None
+    overlay, overlay_rect = None, None
+    last_log = time.perf_counter()
+
+    screen.blit(background, (0, 0))
+    pygame.display.flip()
+    cursor_rect = None  # where the cursor was drawn last frame
+    drawn_at = None
+
     running = True
     while running:
+        t0 = time.perf_counter()
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
@@ -66,17 +303,60 @@ def main() -> None:
             pos.y -= 5
         if keys[pygame.K_DOWN]:
             pos.y += 5
+        if headless:
+            # Scripted path so the benchmark exercises moving dirty rects
+            angle = frame_count * 0.05
+            pos.update(width / 2 + width / 4 * math.cos(angle), height / 2 + height / 4 * math.sin(angle))
+        t1 = time.perf_counter()
 
-        screen.blit(background, (0, 0))
-        pygame.draw.circle(screen, (255, 255, 255), pos, 10)
-        pygame.display.flip()
-        clock.tick(60)
+        dirty = []
+        refresh_overlay = font is not None and frame_count % 30 == 0
+        if args.full_redraw:
+            screen.blit(background, (0, 0))
+            cursor_rect = pygame.draw.circle(screen, (255, 255, 255), pos, CURSOR_RADIUS)
+        else:
+            # Restore what moved or changed from the background, then redraw on top
+            moved = drawn_at != (pos.x, pos.y)
+            if refresh_overlay and overlay_rect is not None:
+                screen.blit(background, overlay_rect, overlay_rect)
+                dirty.append(overlay_rect)
+            if moved and cursor_rect is not None:
+                screen.blit(background, cursor_rect, cursor_rect)
+                dirty.append(cursor_rect)
+            if moved or (dirty and cursor_rect is not None and cursor_rect.collidelist(dirty) != -1):
+                cursor_rect = pygame.draw.circle(screen, (255, 255, 255), pos, CURSOR_RADIUS)
+                dirty.append(cursor_rect)
+                drawn_at = (pos.x, pos.y)
+        if font is not None:
+            if refresh_overlay:
+                overlay = font.render(f"{clock.get_fps():5.1f} fps  {stats.live()}", True, (255, 255, 255), (0, 0, 0))
+            overlay_rect = screen.blit(overlay, (8, 8))
+            dirty.append(overlay_rect)
+        t2 = time.perf_counter()
 
-        if headless:
-            frame_count += 1
-            if frame_limit and frame_count >= frame_limit:
-                running = False
+        if args.full_redraw:
+            pygame.display.flip()
+        elif dirty:
+            pygame.display.update(dirty)
+        t3 = time.perf_counter()
+        stats.add(t1 - t0, t2 - t1, t3 - t2)
+
+        if args.stats and t3 - last_log >= 1.0:
+            print(f"{clock.get_fps():5.1f} fps  {stats.live()}", file=sys.stderr)
+            last_log = t3
+        clock.tick(0 if args.uncapped else 60)
+
+        frame_count += 1
+        if frame_limit and frame_count >= frame_limit:
+            running = False
 
+    if player is not None:
+        player.stop()
+    if headless or args.stats:
+        mode = "full redraw" if args.full_redraw else "dirty rects"
+        print(f"{width}x{height}, {mode}\n{stats.report()}", file=sys.stderr)
+        if player is not None:
+            print(f"  soundtrack: {player.blocks_played} blocks, {player.underruns} underruns", file=sys.stderr)
     pygame.quit()
 
 if __name__ == "__main__":
@@ -0,0 +1,109 @@
+"""Write PNG files row by row with constant memory.
+
+Scanlines are compressed incrementally with ``zlib.compressobj`` and flushed
+as IDAT chunks while rendering continues, so images of any size can be
+written without holding the full picture in memory.
+
+This module uses only the Python standard library; NumPy arrays are accepted
+when NumPy is installed.
+"""
+
+import struct
+import zlib
+from typing import Iterable, Union
+
+COLOR_TYPES = {1: 0, 2: 4, 3: 2, 4: 6}  # channels -> PNG colour type (gray, gray+alpha, RGB, RGBA)
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+def _chunk(kind: bytes, data: bytes) -> bytes:
+    return (struct.pack("!I", len(data)) + kind + data +
+            struct.pack("!I", zlib.crc32(kind + data) & 0xffffffff))
+
+class PNGWriter:
+    """Incremental 8-bit PNG encoder.
+
+    Usage::
+
+        with PNGWriter("out.png", width, height) as png:
+            for strip in strips:          # (rows, width, 3) uint8 arrays or raw bytes
+                png.write_rows(strip)
+    """
+
+    def __init__(self, target, width: int, height: int, channels: int = 3,
+                 level: int = 6, idat_size: int = 1 << 16):
+        if channels not in COLOR_TYPES:
+            raise ValueError(f"unsupported channel count {channels}")
+        self.width, self.height, self.channels = width, height, channels
+        self.row_bytes = width * channels
+        self.rows_written = 0
+        self._own = isinstance(target, str)
+        self._fh = open(target, "wb") if self._own else target
+        self._z = zlib.compressobj(level)
+        self._pending = bytearray()
+        self._idat_size = idat_size
+        self._fh.write(PNG_SIGNATURE)
+        self._fh.write(_chunk(b"IHDR", struct.pack("!IIBBBBB", width, height, 8, COLOR_TYPES[channels], 0, 0, 0)))
+
+    def _emit(self, data: bytes) -> None:
+        self._pending += data
+        while len(self._pending) >= self._idat_size:
+            self._fh.write(_chunk(b"IDAT", bytes(self._pending[:self._idat_size])))
+            del self._pending[:self._idat_size]
+
+    def _check(self, n: int) -> None:
+        if self.rows_written + n > self.height:
+            raise ValueError("more rows than the declared height")
+
+    def write_rows(self, rows: Union[bytes, bytearray, memoryview, "object"]) -> None:
+        """Append whole scanlines: a (rows, width[, channels]) uint8 array or raw row-major bytes."""
+        if hasattr(rows, "tobytes") and hasattr(rows, "reshape"):  # NumPy array
+            import numpy as np
+            flat = rows.reshape(-1, self.row_bytes)
+            n = flat.shape[0]
+            self._check(n)
+            # Filter type 0 (None): one zero byte in front of every scanline.
+            framed = np.zeros((n, self.row_bytes + 1), dtype=np.uint8)
+            framed[:, 1:] = flat
+            buf = framed.tobytes()
+        else:
+            data = memoryview(rows).cast("B")
+            if len(data) % self.row_bytes:
+                raise ValueError("data is not a whole number of scanlines")
+            n = len(data) // self.row_bytes
+            self._check(n)
+            buf = bytearray(n * (self.row_bytes + 1))
+            for r in range(n):
+                start = r * (self.row_bytes + 1) + 1
+                buf[start:start + self.row_bytes] = data[r * self.row_bytes:(r + 1) * self.row_bytes]
+        self._emit(self._z.compress(buf))
+        self.rows_written += n
+
+    def write_row(self, row: Iterable[int]) -> None:
+        """Append one scanline given as bytes or an iterable of channel values."""
+        self.write_rows(row if isinstance(row, (bytes, bytearray)) else bytes(row))
+
+    def close(self) -> None:
+        if self._fh is None:
+            return
+        try:
+            if self.rows_written != self.height:
+                raise ValueError(f"wrote {self.rows_written} of {self.height} rows")
+            self._emit(self._z.flush())
+            if self._pending:
+                self._fh.write(_chunk(b"IDAT", bytes(self._pending)))
+                self._pending.clear()
+            self._fh.write(_chunk(b"IEND", b""))
+        finally:
+            if self._own:
+                self._fh.close()
+            self._fh = None
+
+    def __enter__(self) -> "PNGWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        elif self._own and self._fh is not None:
+            self._fh.close()
+            self._fh = None
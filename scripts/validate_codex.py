@@ -4,69 +4,530 @@
 Codex 144:99 – Integrity Validator
 - Verifies that expanded nodes in data/codex_nodes_full.json match their lock_hash.
 - Also offers a quick consistency check on required fields.
+- --jobs N hashes nodes across a process pool.
+- --incremental keeps a sidecar manifest (file size, mtime and digest; node_id ->
+  lock_hash, byte offset, length, raw digest) from the last successful run. An
+  unchanged file is not parsed at all, and nodes whose raw bytes are unchanged
+  are passed over without being decoded, schema-checked or re-hashed.
+- Streams the top-level array one node at a time from a memory-mapped file, so
+  memory stays bounded and failures are printed as soon as they are found.
+- NODE_SCHEMA (types, enums, nested gods/goddesses) is compiled once into a
+  per-node checker; --report / --junit write per-node timings and failure categories.
 
 Run:
   python scripts/validate_codex.py
+  python scripts/validate_codex.py --jobs 4 --incremental
+  python scripts/validate_codex.py --report validation.json --junit validation.xml
 """
 
-import json, os, sys, hashlib
+import argparse, codecs, json, mmap, os, sys, hashlib, time
+import xml.etree.ElementTree as ET
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
 
-REQUIRED_TOP = [
-    "node_id","name","locked","egregore_id","shem_angel","goetic_demon",
-    "gods","goddesses","chakra","planet","zodiac","element","platonic_solid",
-    "geometry","art_style","function","ritual_use","fusion_tags",
-    "solfeggio_freq","music_profile","color_scheme","healing_profile","symbolic_keywords"
-]
+class OneOf:
+    """Enum: the value must be one of these literals (True is not 1)."""
+    def __init__(self, *values):
+        self.values = values
+
+class AnyOf:
+    """The value must satisfy at least one of these specs."""
+    def __init__(self, *specs):
+        self.specs = specs
+
+class Opt:
+    """Marks a dict key as optional; its value is still checked when present."""
+    def __init__(self, spec):
+        self.spec = spec
+
+NUMBER = (int, float)
+DEITY = {"name": Opt(str), "culture": Opt(str)}
+
+# Spec language: a type (or tuple of types), [item_spec], {key: spec}, OneOf, AnyOf, Opt.
+NODE_SCHEMA = {
+    "node_id": int,
+    "name": str,
+    "locked": bool,
+    "egregore_id": str,
+    "shem_angel": str,
+    "goetic_demon": str,
+    "gods": [DEITY],
+    "goddesses": [DEITY],
+    "chakra": str,
+    "planet": AnyOf(str, [str]),
+    "zodiac": str,
+    "element": AnyOf(str, [str]),
+    "platonic_solid": str,
+    "geometry": str,
+    "art_style": str,
+    "function": str,
+    "ritual_use": str,
+    "fusion_tags": [str],
+    "solfeggio_freq": AnyOf(NUMBER, [NUMBER]),
+    "music_profile": dict,
+    "color_scheme": AnyOf(dict, list, str),
+    "healing_profile": {"ptsd_safe": Opt(OneOf(True, False, "with care"))},
+    "symbolic_keywords": [str],
+}
+
+REQUIRED_TOP = list(NODE_SCHEMA)
+
+_JSON_NAMES = {dict: "object", list: "array", str: "string", int: "integer", float: "number", bool: "boolean"}
+
+def _type_name(t) -> str:
+    if isinstance(t, tuple):
+        return " or ".join(_JSON_NAMES.get(x, x.__name__) for x in t)
+    return _JSON_NAMES.get(t, t.__name__)
+
+_MISSING = object()
+
+def _compile(spec):
+    """Return (valid, explain): a fast bool predicate and a slow path that
+    appends (category, message) pairs. explain only runs when valid fails."""
+    if isinstance(spec, (type, tuple)):
+        types = spec if isinstance(spec, tuple) else (spec,)
+        if bool in types or not any(issubclass(bool, t) for t in types):
+            valid = lambda v: isinstance(v, types)
+        else:  # bool is an int subclass; only accept it when asked
+            valid = lambda v: isinstance(v, types) and not isinstance(v, bool)
+        want = _type_name(spec)
+
+        def explain(v, path, errors):
+            errors.append(("type", f"{path}: expected {want}, got {_type_name(type(v))}"))
+        return valid, explain
+
+    if isinstance(spec, OneOf):
+        allowed = {(type(x), x) for x in spec.values}
+        shown = " | ".join(json.dumps(x) for x in spec.values)
+        valid = lambda v: (type(v), v) in allowed
+
+        def explain(v, path, errors):
+            errors.append(("enum", f"{path}: {json.dumps(v)} not in {shown}"))
+        return valid, explain
+
+    if isinstance(spec, AnyOf):
+        options = [_compile(s)[0] for s in spec.specs]
+        valid = lambda v: any(ok(v) for ok in options)
+
+        def explain(v, path, errors):
+            errors.append(("type", f"{path}: {_type_name(type(v))} matches none of the allowed shapes"))
+        return valid, explain
+
+    if isinstance(spec, list):
+        item_valid, item_explain = _compile(spec[0])
+        valid = lambda v: isinstance(v, list) and all(item_valid(x) for x in v)
+
+        def explain(v, path, errors):
+            if not isinstance(v, list):
+                errors.append(("type", f"{path}: expected array, got {_type_name(type(v))}"))
+                return
+            for i, x in enumerate(v):
+                if not item_valid(x):
+                    item_explain(x, f"{path}[{i}]", errors)
+        return valid, explain
+
+    if isinstance(spec, dict):
+        fields, required, optional_simple, nested = [], [], [], []
+        for key, sub in spec.items():
+            optional = isinstance(sub, Opt)
+            inner = sub.spec if optional else sub
+            sub_valid, sub_explain = _compile(inner)
+            fields.append((key, optional, sub_valid, sub_explain))
+            if isinstance(inner, (type, tuple)):
+                # json only produces exact built-in types, so a set lookup is enough
+                accepted = frozenset(inner if isinstance(inner, tuple) else (inner,))
+                (optional_simple if optional else required).append((key, accepted))
+            else:
+                nested.append((key, optional, sub_valid))
+
+        def valid(v):
+            if type(v) is not dict:
+                return False
+            get = v.get
+            for key, accepted in required:
+                if type(get(key, _MISSING)) not in accepted:
+                    return False
+            for key, accepted in optional_simple:
+                x = get(key, _MISSING)
+                if x is not _MISSING and type(x) not in accepted:
+                    return False
+            for key, optional, sub_valid in nested:
+                x = get(key, _MISSING)
+                if x is _MISSING:
+                    if not optional:
+                        return False
+                elif not sub_valid(x):
+                    return False
+            return True
+
+        def explain(v, path, errors):
+            if not isinstance(v, dict):
+                errors.append(("type", f"{path or 'node'}: expected object, got {_type_name(type(v))}"))
+                return
+            for key, optional, sub_valid, sub_explain in fields:
+                where = f"{path}.{key}" if path else key
+                if key in v:
+                    if not sub_valid(v[key]):
+                        sub_explain(v[key], where, errors)
+                elif not optional:
+                    errors.append(("missing", f"missing key '{where}'"))
+        return valid, explain
+
+    raise TypeError(f"unsupported spec {spec!r}")
+
+def compile_spec(spec):
+    """Compile a spec once into check(value, path, errors)."""
+    valid, explain = _compile(spec)
+
+    def check(v, path, errors):
+        if not valid(v):
+            explain(v, path, errors)
+    return check
+
+CHECK_NODE = compile_spec(NODE_SCHEMA)
 
 EXPANDED_PATH = os.path.join("data","codex_nodes_full.json")
+MANIFEST_PATH = os.path.join("data","codex_nodes_full.manifest.json")
+MANIFEST_VERSION = 2  # bump when NODE_SCHEMA or the per-node checks change
+CHUNK_SIZE = 1 << 20  # bytes decoded per read from the mapped file
+MAX_NODE_SIZE = 16 << 20  # characters one node may span before it is reported as malformed
+EDGE = 16  # a parse ending or failing this close to the end of the text may just be cut off
+SKIP_READ = 64  # bytes decoded after a skipped node, doubling up to CHUNK_SIZE
+BATCH_SIZE = 256  # nodes per worker task with --jobs
 
 def compute_lock_hash(node_no_hash: dict) -> str:
     """Recreate lock hash exactly like build_codex.py (sort_keys=True, UTF-8)."""
     payload = json.dumps(node_no_hash, sort_keys=True, ensure_ascii=False).encode("utf-8")
     return hashlib.sha256(payload).hexdigest()
 
-def main():
+def node_lock_hash(n: dict) -> str:
+    n_copy = dict(n)
+    n_copy.pop("lock_hash", None)
+    return compute_lock_hash(n_copy)
+
+def hash_raw_nodes(raws: list) -> list:
+    """Worker entry point: (lock hash, seconds) for a batch of raw node JSON texts."""
+    out = []
+    for raw in raws:
+        t0 = time.perf_counter()
+        out.append((node_lock_hash(json.loads(raw)), time.perf_counter() - t0))
+    return out
+
+class Report:
+    """Prints failures as they happen; keeps per-node records only when a report file is wanted."""
+
+    def __init__(self, keep: bool):
+        self.ok = True
+        self.categories = Counter()
+        self.records = [] if keep else None
+        self.errors = []  # failures not tied to one node (e.g. parse errors)
+
+    def node(self, nid, offset):
+        if self.records is None:
+            return None
+        rec = {"node_id": nid, "offset": offset, "seconds": 0.0, "failures": []}
+        self.records.append(rec)
+        return rec
+
+    def fail(self, rec, category, message):
+        self.ok = False
+        self.categories[category] += 1
+        print(f"[FAIL] {message}", flush=True)
+        if self.records is not None:
+            (rec["failures"] if rec is not None else self.errors).append({"category": category, "message": message})
+
+    def write_json(self, path, source, seconds, count, hashed, slowest=10):
+        records = self.records or []
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "source": source, "ok": self.ok, "nodes": count, "rehashed": hashed,
+                "seconds": round(seconds, 6), "categories": dict(self.categories),
+                "errors": self.errors,
+                "slowest": sorted(records, key=lambda r: -r["seconds"])[:slowest],
+                "timings": records,
+            }, f, ensure_ascii=False, indent=1)
+
+    def write_junit(self, path, source, seconds):
+        records = self.records or []
+        failed = sum(1 for r in records if r["failures"]) + len(self.errors)
+        suite = ET.Element("testsuite", name="codex", tests=str(len(records) + len(self.errors)),
+                           failures=str(failed), time=f"{seconds:.6f}")
+        ET.SubElement(ET.SubElement(suite, "properties"), "property", name="source", value=source)
+        for r in records:
+            case = ET.SubElement(suite, "testcase", classname="codex.node", name=f"node {r['node_id']}",
+                                 time=f"{r['seconds']:.6f}")
+            for fl in r["failures"]:
+                ET.SubElement(case, "failure", type=fl["category"], message=fl["message"])
+        for fl in self.errors:
+            case = ET.SubElement(suite, "testcase", classname="codex.file", name=fl["category"], time="0")
+            ET.SubElement(case, "failure", type=fl["category"], message=fl["message"])
+        ET.ElementTree(suite).write(path, encoding="utf-8", xml_declaration=True)
+
+def iter_nodes(path: str, chunk_size: int = CHUNK_SIZE, reuse=None, max_node: int = MAX_NODE_SIZE):
+    """Yield (byte_offset, raw_text, node) for each element of the top-level array.
+
+    Only the current chunk plus one partial node (at most max_node characters)
+    is ever held in memory.
+    reuse(mm, offset) may return (length, value) for an element known not to
+    have changed; it is then yielded as (byte_offset, None, value) and its
+    bytes are skipped without decoding.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            raise ValueError("empty file, expected a top-level JSON array")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            read, step = 0, chunk_size
+            buf, i, offset = "", 0, 0
+
+            def fill():
+                """Drop consumed text and decode the next chunk; False at EOF."""
+                nonlocal buf, i, read, step
+                if read >= size:
+                    return False
+                chunk = mm[read:read + step]
+                step = min(step * 2, chunk_size)
+                read += len(chunk)
+                buf = buf[i:] + utf8.decode(chunk, final=read >= size)
+                i = 0
+                return True
+
+            def skip(chars):
+                nonlocal i, offset
+                while True:
+                    while i < len(buf) and buf[i] in chars:
+                        i += 1
+                        offset += 1  # whitespace and commas are single-byte
+                    if i < len(buf) or not fill():
+                        return
+
+            skip(" \t\r\n")
+            if i >= len(buf) or buf[i] != "[":
+                raise ValueError("expected a top-level JSON array")
+            i += 1
+            offset += 1
+            while True:
+                skip(" \t\r\n,")
+                if i >= len(buf):
+                    raise ValueError(f"unterminated array at byte {offset}")
+                if buf[i] == "]":
+                    return
+                known = reuse(mm, offset) if reuse is not None else None
+                if known is not None:
+                    length, value = known
+                    yield offset, None, value
+                    # Node boundaries are ASCII, so decoding restarts cleanly after the skip.
+                    # Reads start small again: the next node is likely skipped too.
+                    offset = read = offset + length
+                    buf, i, step = "", 0, SKIP_READ
+                    utf8.reset()
+                    continue
+                while True:
+                    try:
+                        node, end = decoder.raw_decode(buf, i)
+                    except json.JSONDecodeError as e:
+                        # Read more and retry only if the error may be the chunk ending mid-node.
+                        cut = e.pos >= len(buf) - EDGE or e.msg.startswith("Unterminated string")
+                        if not cut or not fill():
+                            raise ValueError(f"invalid JSON in node at byte {offset}: {e.msg}")
+                        if len(buf) - i > max_node:
+                            raise ValueError(f"node at byte {offset} is larger than {max_node} characters")
+                        continue
+                    # A number ending at the edge of the text may continue in the next chunk.
+                    if end < len(buf) - EDGE or not fill():
+                        break
+                raw = buf[i:end]
+                yield offset, raw, node
+                offset += len(raw.encode("utf-8"))
+                i = end
+
+def file_digest(path: str) -> str:
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.sha256().hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return hashlib.sha256(mm).hexdigest()
+
+def load_manifest(path: str) -> dict:
+    """The last successful run's manifest, or {} if missing, unreadable or from another version."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    return manifest
+
+def manifest_matches(manifest: dict, source: str) -> bool:
+    """True when the source file is byte-for-byte the one the manifest was written for."""
+    if not manifest:
+        return False
+    st = os.stat(source)
+    if manifest.get("size") != st.st_size or manifest.get("mtime") != st.st_mtime:
+        return False
+    return manifest.get("digest") == file_digest(source)
+
+def save_manifest(path: str, source: str, entries: dict) -> None:
+    st = os.stat(source)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "source": source, "mtime": st.st_mtime, "size": st.st_size,
+                   "digest": file_digest(source), "nodes": entries}, f)
+    os.replace(tmp, path)
+
+def unchanged_nodes(previous: dict):
+    """(reuse, resync) for passing over nodes whose bytes match the previous manifest.
+
+    reuse is the iter_nodes callback. It expects the next old node where the
+    last one left off, so inserted, deleted or resized nodes only cost a
+    decode of themselves; resync(nid) realigns after each decoded node.
+    """
+    order = sorted((e["offset"], nid) for nid, e in previous.items())
+    following = {nid: nxt for (_, nid), (_, nxt) in zip(order, order[1:] + [(None, None)])}
+    state = {"expect": order[0][1] if order else None}
+
+    def reuse(mm, offset):
+        nid = state["expect"]
+        if nid is None:
+            return None
+        e = previous[nid]
+        end = offset + e["length"]
+        if end > len(mm) or hashlib.sha256(mm[offset:end]).hexdigest() != e["digest"]:
+            return None
+        state["expect"] = following[nid]
+        return e["length"], (nid, e)
+
+    def resync(nid):
+        if str(nid) in following:
+            state["expect"] = following[str(nid)]
+
+    return reuse, resync
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate codex lock hashes and structure")
+    parser.add_argument("--jobs", type=int, default=1, help="hash nodes across N worker processes")
+    parser.add_argument("--incremental", action="store_true", help="only re-check nodes changed since the last successful run")
+    parser.add_argument("--manifest", default=MANIFEST_PATH, help="sidecar manifest used by --incremental")
+    parser.add_argument("--report", help="write a JSON report with per-node timings and failure categories")
+    parser.add_argument("--junit", help="write a JUnit XML report (one testcase per node)")
+    args = parser.parse_args(argv)
+
     if not os.path.exists(EXPANDED_PATH):
         print(f"[ERROR] Missing {EXPANDED_PATH}. Run scripts/build_codex.py first.", file=sys.stderr)
         sys.exit(2)
 
-    with open(EXPANDED_PATH,"r",encoding="utf-8") as f:
-        nodes = json.load(f)
+    manifest = load_manifest(args.manifest) if args.incremental else {}
+    previous = manifest.get("nodes", {})
+    entries = {}
+    if manifest_matches(manifest, EXPANDED_PATH) and not (args.report or args.junit):
+        print(f"[OK] {len(previous)} nodes unchanged since the last successful run.")
+        sys.exit(0)
+    reuse, resync = unchanged_nodes(previous) if previous else (None, None)
 
-    ok = True
+    report = Report(keep=bool(args.report or args.junit))
+    started = time.perf_counter()
     seen_ids = set()
-    for n in nodes:
-        # basic structural checks
-        for key in REQUIRED_TOP:
-            if key not in n:
-                ok = False
-                print(f"[FAIL] node {n.get('node_id','?')}: missing key '{key}'")
-
-        nid = n.get("node_id")
-        if nid in seen_ids:
-            ok = False
-            print(f"[FAIL] duplicate node_id {nid}")
-        seen_ids.add(nid)
-
-        if not n.get("locked", False):
-            ok = False
-            print(f"[FAIL] node {nid}: locked flag must be True")
-
-        # lock_hash validation
-        lock_hash = n.get("lock_hash")
-        if not lock_hash:
-            ok = False
-            print(f"[FAIL] node {nid}: missing lock_hash")
+    count = hashed = 0
+    pool = ProcessPoolExecutor(max_workers=args.jobs) if args.jobs > 1 else None
+    batch, in_flight = [], deque()  # in_flight is bounded so memory stays flat
+
+    def check_hash(rec, nid, lock_hash, calc):
+        if calc != lock_hash:
+            report.fail(rec, "lock_hash", f"node {nid}: lock_hash mismatch (calc {calc[:12]}..., file {lock_hash[:12]}...)")
+
+    def submit():
+        in_flight.append(([m for m, _ in batch], pool.submit(hash_raw_nodes, [r for _, r in batch])))
+        batch.clear()
+
+    def drain(keep):
+        while len(in_flight) > keep:
+            meta, fut = in_flight.popleft()
+            for (rec, nid, lock_hash), (calc, seconds) in zip(meta, fut.result()):
+                if rec is not None:
+                    rec["seconds"] += seconds
+                check_hash(rec, nid, lock_hash, calc)
+
+    try:
+        for offset, raw, n in iter_nodes(EXPANDED_PATH, reuse=reuse):
+            t0 = time.perf_counter()
+            count += 1
+            if raw is None:
+                # Byte-identical to a node that passed last time: only the file-wide checks apply.
+                nid, e = n
+                rec = report.node(e["node_id"], offset)
+                if nid in seen_ids:
+                    report.fail(rec, "duplicate", f"duplicate node_id {nid}")
+                seen_ids.add(nid)
+                entries[nid] = {**e, "offset": offset}
+                if rec is not None:
+                    rec["seconds"] += time.perf_counter() - t0
+                continue
+            nid = n.get("node_id", "?") if isinstance(n, dict) else "?"
+            rec = report.node(nid, offset)
+            if resync is not None:
+                resync(nid)
+
+            # structural checks: compiled schema (presence, types, enums, nested shapes)
+            errors = []
+            CHECK_NODE(n, "", errors)
+            for category, message in errors:
+                report.fail(rec, category, f"node {nid}: {message}")
+            if not isinstance(n, dict):
+                continue
+
+            if str(nid) in seen_ids:
+                report.fail(rec, "duplicate", f"duplicate node_id {nid}")
+            seen_ids.add(str(nid))
+
+            if n.get("locked", False) is not True:
+                report.fail(rec, "locked", f"node {nid}: locked flag must be True")
+
+            # lock_hash validation (skipped when the raw bytes match the last good run)
+            lock_hash = n.get("lock_hash")
+            if not lock_hash:
+                report.fail(rec, "lock_hash", f"node {nid}: missing lock_hash")
+            else:
+                unchanged = False
+                if args.incremental:
+                    data = raw.encode("utf-8")
+                    digest = hashlib.sha256(data).hexdigest()
+                    entries[str(nid)] = {"node_id": nid, "lock_hash": lock_hash, "offset": offset, "length": len(data), "digest": digest}
+                    unchanged = previous.get(str(nid), {}).get("digest") == digest
+                if not unchanged:
+                    hashed += 1
+                    if pool is None:
+                        check_hash(rec, nid, lock_hash, node_lock_hash(n))
+                    else:
+                        batch.append(((rec, nid, lock_hash), raw))
+                        if len(batch) >= BATCH_SIZE:
+                            submit()
+                            drain(args.jobs * 2)
+            if rec is not None:
+                rec["seconds"] += time.perf_counter() - t0
+    except ValueError as e:
+        report.fail(None, "parse", str(e))
+    finally:
+        if pool is not None:
+            if batch:
+                submit()
+            drain(0)
+            pool.shutdown()
+
+    seconds = time.perf_counter() - started
+    if args.report:
+        report.write_json(args.report, EXPANDED_PATH, seconds, count, hashed)
+    if args.junit:
+        report.write_junit(args.junit, EXPANDED_PATH, seconds)
+
+    if report.ok:
+        if args.incremental:
+            save_manifest(args.manifest, EXPANDED_PATH, entries)
+            print(f"[OK] {count} nodes validated ({hashed} re-hashed, {count - hashed} unchanged). All lock_hash values match and structure is sane.")
         else:
-            n_copy = dict(n)
-            n_copy.pop("lock_hash", None)
-            calc = compute_lock_hash(n_copy)
-            if calc != lock_hash:
-                ok = False
-                print(f"[FAIL] node {nid}: lock_hash mismatch (calc {calc[:12]}..., file {lock_hash[:12]}...)")
-
-    if ok:
-        print(f"[OK] {len(nodes)} nodes validated. All lock_hash values match and structure is sane.")
+            print(f"[OK] {count} nodes validated. All lock_hash values match and structure is sane.")
         sys.exit(0)
     else:
         print("[ERROR] Validation failed. See messages above.", file=sys.stderr)
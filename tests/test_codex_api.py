@@ -0,0 +1,281 @@
+"""Tests for api/: the indexed /nodes filters against the original scan, and the read endpoints."""
+
+import base64
+import itertools
+import json
+import os
+import sys
+import time
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+from fastapi.testclient import TestClient  # noqa: E402
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from api import codex_api  # noqa: E402
+from api.codex_store import CodexStore, _signature  # noqa: E402
+
+ELEMENTS = ["fire", "water", ["air", "fire"], None]
+PLANETS = ["Sun", ["Moon", "Mars"], "Saturn"]
+ZODIACS = ["Aries", "Leo", "Pisces", "Virgo"]
+TAGS = [["a"], ["b"], ["a", "c"], []]
+SAFETY = [True, "with care", False, None]
+CULTURES = ["Egypt", "Greece", "Norse"]
+
+
+def make_nodes():
+    nodes = []
+    for i in range(40):
+        node = {
+            "node_id": i + 1,
+            "name": f"Node {i + 1}",
+            "planet": PLANETS[i % 3],
+            "zodiac": ZODIACS[i % 4],
+            "fusion_tags": TAGS[(i // 2) % 4],
+            "healing_profile": {"ptsd_safe": SAFETY[(i // 3) % 4]},
+            "gods": [{"name": "Ra", "culture": CULTURES[i % 3]}],
+            "goddesses": [{"name": "Isis", "culture": CULTURES[(i + 1) % 3]}] if i % 5 == 0 else [],
+            "symbolic_keywords": ["light"],
+            "lock_hash": f"h{i + 1}",
+        }
+        if ELEMENTS[i % 4] is not None:
+            node["element"] = ELEMENTS[i % 4]
+        nodes.append(node)
+    nodes[7]["name"] = "Serp of the deep"
+    nodes[9]["name"] = "Serpent crown"
+    nodes[11]["symbolic_keywords"] = ["serpentine"]
+    return nodes
+
+
+def baseline_match(n, element=None, planet=None, zodiac=None, safety=None, tag=None, culture=None):
+    """The filter from the original api/codex_api.py, which scanned every node."""
+    if element and element not in (n.get("element") if isinstance(n.get("element"), str) else " / ".join(n.get("element", []))):
+        return False
+    if planet and planet not in (n.get("planet") if isinstance(n.get("planet"), str) else " / ".join(n.get("planet", []))):
+        return False
+    if zodiac and zodiac not in n.get("zodiac", ""):
+        return False
+    if tag and tag not in n.get("fusion_tags", []):
+        return False
+    if safety:
+        s = n.get("healing_profile", {}).get("ptsd_safe")
+        if safety == "ptsd_true" and s is not True: return False
+        if safety == "with_care" and s != "with care": return False
+    if culture:
+        gg = (n.get("gods", []) or []) + (n.get("goddesses", []) or [])
+        if not any(culture == g.get("culture") for g in gg):
+            return False
+    return True
+
+
+FILTER_VALUES = {
+    "element": [None, "fire", "air", "ire", "earth"],
+    "planet": [None, "Sun", "Mars", "Moon / Mars"],
+    "zodiac": [None, "Leo", "is"],
+    "safety": [None, "ptsd_true", "with_care"],
+    "tag": [None, "a", "c"],
+    "culture": [None, "Egypt", "Norse"],
+}
+COMBINATIONS = [dict(zip(FILTER_VALUES, values)) for values in itertools.product(*FILTER_VALUES.values())]
+
+
+@pytest.fixture
+def nodes():
+    return make_nodes()
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch, nodes):
+    path = tmp_path / "codex_nodes_full.json"
+    path.write_text(json.dumps(nodes), encoding="utf-8")
+    monkeypatch.setattr(codex_api, "store", CodexStore(str(path)))
+    return TestClient(codex_api.app)
+
+
+def expected_ids(nodes, filters):
+    return [n["node_id"] for n in nodes if baseline_match(n, **filters)]
+
+
+# -- filters ---------------------------------------------------------------
+
+def test_select_and_scan_match_the_baseline_filter(client, nodes):
+    snap = codex_api.store.current()
+    for filters in COMBINATIONS:
+        want = expected_ids(nodes, filters)
+        assert [nodes[p]["node_id"] for p in snap.select(**filters)] == want, filters
+        assert [nodes[p]["node_id"] for p in snap.scan(0, **filters)] == want, filters
+
+
+@pytest.mark.parametrize("filters", [
+    {}, {"element": "fire"}, {"element": "fire", "tag": "a"}, {"planet": "Mars", "culture": "Egypt"},
+    {"safety": "with_care", "zodiac": "is"}, {"tag": "c", "culture": "Norse", "element": "air"},
+])
+def test_list_nodes_matches_the_baseline(client, nodes, filters):
+    body = client.get("/nodes", params={**filters, "limit": 1000}).json()
+    want = expected_ids(nodes, filters)
+    assert body["count"] == len(want)
+    assert [n["node_id"] for n in body["items"]] == want
+    assert body["next_cursor"] is None
+
+
+# -- hot reload ------------------------------------------------------------
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_watcher_reloads_good_builds_and_survives_bad_ones(client, tmp_path, nodes):
+    path = tmp_path / "codex_nodes_full.json"
+    store = codex_api.store
+    store.watch(0.01)
+    try:
+        first = client.get("/health").json()["dataset"]["version"]
+
+        def write(data):
+            path.write_text(data if isinstance(data, str) else json.dumps(data), encoding="utf-8")
+            signature = _signature(str(path))
+            assert wait_for(lambda: store._signature == signature)
+
+        write(nodes[:10])
+        second = client.get("/health").json()["dataset"]
+        assert second["version"] != first and second["nodes"] == 10
+
+        for bad in ('{"a": 1}', [1, 2], [{"node_id": 1, "fusion_tags": [["not", "a", "tag"]]}], "[{"):
+            write(bad)
+            assert client.get("/health").json()["dataset"] == second
+            assert store._watcher.is_alive()
+
+        write(nodes[:5])
+        assert client.get("/health").json()["dataset"]["nodes"] == 5
+        assert client.get("/nodes/3").json()["node_id"] == 3
+    finally:
+        store.stop()
+
+
+# -- conditional requests --------------------------------------------------
+
+@pytest.mark.parametrize("url", ["/nodes?element=fire", "/nodes/3", "/nodes:batch?ids=1,2", "/search?q=serp"])
+def test_if_none_match_returns_304(client, url):
+    first = client.get(url)
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and first.headers["cache-control"] == codex_api.CACHE_CONTROL
+    for header in (etag, "W/" + etag, f'"other", {etag}', "*"):
+        again = client.get(url, headers={"If-None-Match": header})
+        assert again.status_code == 304 and again.content == b"" and again.headers["etag"] == etag
+    assert client.get(url, headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_etag_depends_on_the_query(client):
+    assert client.get("/nodes?element=fire").headers["etag"] != client.get("/nodes?element=water").headers["etag"]
+    assert client.get("/nodes/3").headers["etag"] == '"h3"'
+
+
+# -- pagination ------------------------------------------------------------
+
+def walk(client, params, count):
+    seen, cursor = [], None
+    while True:
+        page = client.get("/nodes", params={**params, "limit": 3, "count": str(count).lower(),
+                                            **({"cursor": cursor} if cursor else {})}).json()
+        assert ("count" in page) is count
+        seen += [n["node_id"] for n in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return seen, page
+
+
+@pytest.mark.parametrize("count", [True, False])
+@pytest.mark.parametrize("filters", [{}, {"element": "fire"}, {"tag": "a", "safety": "ptsd_true"}])
+def test_cursor_resume_visits_every_match_once(client, nodes, filters, count):
+    seen, last = walk(client, filters, count)
+    want = expected_ids(nodes, filters)
+    assert seen == want
+    if count:
+        assert last["count"] == len(want)
+
+
+def test_offset_pages_and_projection(client, nodes):
+    want = expected_ids(nodes, {"element": "fire"})
+    body = client.get("/nodes", params={"element": "fire", "offset": 2, "limit": 4, "fields": "node_id,zodiac"}).json()
+    assert [n["node_id"] for n in body["items"]] == want[2:6]
+    assert all(set(n) == {"node_id", "zodiac"} for n in body["items"])
+    assert body["next_cursor"] is not None
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    base64.urlsafe_b64encode(b'{"after":[1]}').decode(),
+    base64.urlsafe_b64encode(b'{"after":true}').decode(),
+    base64.urlsafe_b64encode(b"[1]").decode(),
+])
+def test_malformed_cursor_is_a_400(client, cursor):
+    response = client.get("/nodes", params={"cursor": cursor})
+    assert response.status_code == 400 and response.json()["detail"] == "Invalid cursor"
+
+
+def test_stale_cursor_is_a_400(client):
+    response = client.get("/nodes", params={"cursor": codex_api._encode_cursor(999)})
+    assert response.status_code == 400 and "Stale cursor" in response.json()["detail"]
+
+
+# -- batch -----------------------------------------------------------------
+
+def test_batch_lists_missing_ids(client):
+    body = client.get("/nodes:batch", params={"ids": "3,999,1,3", "fields": "node_id"}).json()
+    assert body == {"items": [{"node_id": 3}, {"node_id": 1}], "missing": [999]}
+    posted = client.post("/nodes:batch", json={"ids": [3, 999, 1, 3], "fields": "node_id"}).json()
+    assert posted == body
+
+
+def test_batch_rejects_bad_ids_and_oversized_requests(client):
+    assert client.get("/nodes:batch", params={"ids": "1,x"}).status_code == 400
+    too_many = ",".join(str(i) for i in range(codex_api.BATCH_LIMIT + 1))
+    assert client.get("/nodes:batch", params={"ids": too_many}).status_code == 400
+
+
+# -- ndjson export ---------------------------------------------------------
+
+@pytest.mark.parametrize("filters", [{}, {"element": "fire"}, {"tag": "a", "culture": "Egypt"}, {"tag": "zzz"}])
+def test_ndjson_streams_every_match_one_per_line(client, nodes, filters, monkeypatch):
+    monkeypatch.setattr(codex_api, "STREAM_CHUNK", 64)  # many chunks, lines split across them
+    response = client.get("/nodes.ndjson", params={**filters, "fields": "node_id,zodiac"})
+    assert response.status_code == 200 and response.headers["content-type"] == "application/x-ndjson"
+    lines = response.text.splitlines()
+    assert response.text == "".join(line + "\n" for line in lines)
+    want = [{"node_id": n["node_id"], "zodiac": n["zodiac"]} for n in nodes if baseline_match(n, **filters)]
+    assert [json.loads(line) for line in lines] == want
+
+
+def test_ndjson_full_nodes_and_304(client, nodes):
+    response = client.get("/nodes.ndjson")
+    assert [json.loads(line) for line in response.text.splitlines()] == nodes
+    etag = response.headers["etag"]
+    assert client.get("/nodes.ndjson", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/nodes.ndjson?fields=node_id").headers["etag"] != etag
+
+
+# -- search ----------------------------------------------------------------
+
+def test_search_ranks_exact_tokens_above_prefix_matches(client):
+    body = client.get("/search", params={"q": "serp", "fields": "node_id"}).json()
+    ids = [item["node"]["node_id"] for item in body["items"]]
+    assert ids[0] == 8 and set(ids) == {8, 10, 12} and body["count"] == 3
+    scores = [item["score"] for item in body["items"]]
+    assert scores == sorted(scores, reverse=True)
+
+    exact = client.get("/search", params={"q": "serp", "prefix": "false", "fields": "node_id"}).json()
+    assert [item["node"]["node_id"] for item in exact["items"]] == [8]
+
+
+def test_search_limit_keeps_the_total(client):
+    # every node but #12 (whose keywords were replaced) is tagged "light"
+    body = client.get("/search", params={"q": "light", "limit": 5}).json()
+    assert body["count"] == 39 and len(body["items"]) == 5
@@ -0,0 +1,42 @@
+"""Tests for collage_scene.py: size variants expand into the intended images."""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import collage_scene as cs  # noqa: E402
+
+SOLID = {"background": [{"type": "solid", "color": "#102030"}], "overlays": [], "palette": "collage"}
+
+
+def sizes(size):
+    return [cs.scene_size(scene) for scene in cs.expand_scenes([{**SOLID, "size": size}])]
+
+
+@pytest.mark.parametrize("size, expected", [
+    (64, [(64, 64)]),
+    ([[300, 200]], [(300, 200)]),
+    ([300, 200], [(300, 300), (200, 200)]),
+    ([64, [300, 200]], [(64, 64), (300, 200)]),
+])
+def test_size_variants(size, expected):
+    assert sizes(size) == expected
+
+
+@pytest.mark.parametrize("size", [[[300]], [[300, 200, 100]], [[300, "200"]], ["2048"]])
+def test_malformed_size_is_rejected(size):
+    with pytest.raises(ValueError, match="scene size"):
+        sizes(size)
+
+
+def test_rectangle_renders_one_image(tmp_path):
+    results = cs.render_scenes([{**SOLID, "name": "rect", "size": [[30, 20]]}], str(tmp_path), workers=1)
+    assert len(results) == 1 and results[0][1]
+    path = results[0][0]
+    assert os.path.basename(path).startswith("rect_30x20_collage-")
+    with open(path, "rb") as f:
+        header = f.read(24)
+    assert int.from_bytes(header[16:20], "big") == 30 and int.from_bytes(header[20:24], "big") == 20
@@ -0,0 +1,188 @@
+"""Tests for scripts/validate_codex.py: the streaming parser and --incremental."""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import validate_codex as vc  # noqa: E402
+
+
+def write(tmp_path, text, name="codex.json"):
+    path = tmp_path / name
+    path.write_bytes(text.encode("utf-8") if isinstance(text, str) else text)
+    return str(path)
+
+
+def parse(path, chunk_size, **kwargs):
+    return [(offset, raw, node) for offset, raw, node in vc.iter_nodes(path, chunk_size, **kwargs)]
+
+
+def make_node(nid, **overrides):
+    node = {
+        "node_id": nid, "name": f"Node {nid} ✶", "locked": True, "egregore_id": f"e{nid}",
+        "shem_angel": "Vehuiah", "goetic_demon": "Bael", "gods": [{"name": "Ra", "culture": "Egypt"}],
+        "goddesses": [{"name": "Isis"}], "chakra": "crown", "planet": ["Sun"], "zodiac": "Aries",
+        "element": "fire", "platonic_solid": "cube", "geometry": "vesica", "art_style": "visionary",
+        "function": "illumination", "ritual_use": "meditation", "fusion_tags": ["a"], "solfeggio_freq": 528,
+        "music_profile": {"key": "C"}, "color_scheme": "gold", "healing_profile": {"ptsd_safe": "with care"},
+        "symbolic_keywords": ["light"],
+    }
+    node.update(overrides)
+    node["lock_hash"] = vc.node_lock_hash(node)
+    return node
+
+
+# -- iter_nodes ------------------------------------------------------------
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7, 64, 1 << 20])
+def test_chunk_boundaries_match_json_loads(tmp_path, chunk_size):
+    nodes = [{"id": i, "text": "x" * i, "nested": {"list": list(range(i))}} for i in range(12)]
+    text = json.dumps(nodes, indent=2)
+    path = write(tmp_path, text)
+    parsed = parse(path, chunk_size)
+    assert [node for _, _, node in parsed] == nodes
+    data = text.encode("utf-8")
+    for offset, raw, _ in parsed:
+        assert data[offset:offset + len(raw.encode("utf-8"))] == raw.encode("utf-8")
+
+
+@pytest.mark.parametrize("chunk_size", range(1, 12))
+def test_scalars_cut_at_a_chunk_boundary_are_not_split(tmp_path, chunk_size):
+    values = [1, 23, 456, -7.25, 1.5e3, True, False, None, "ab"]
+    path = write(tmp_path, "[1, 23, 456, -7.25, 1.5e3, true, false, null, \"ab\"]")
+    assert [node for _, _, node in parse(path, chunk_size)] == values
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 4, 5, 1 << 20])
+def test_multibyte_utf8_offsets_are_in_bytes(tmp_path, chunk_size):
+    nodes = [{"name": "é✶"}, {"name": "🜂🜄"}, {"name": "plain"}]
+    text = "[" + ", ".join(json.dumps(n, ensure_ascii=False) for n in nodes) + "]"
+    data = text.encode("utf-8")
+    path = write(tmp_path, data)
+    parsed = parse(path, chunk_size)
+    assert [node for _, _, node in parsed] == nodes
+    assert [offset for offset, _, _ in parsed] == [data.index(json.dumps(n, ensure_ascii=False).encode("utf-8"))
+                                                   for n in nodes]
+
+
+@pytest.mark.parametrize("text, message", [
+    ("", "empty file"),
+    ("{}", "expected a top-level JSON array"),
+    ('[{"a": 1}, {"b": ', "invalid JSON in node at byte 11"),
+    ('[{"a": 1}, {"b": "unterminated', "invalid JSON in node at byte 11"),
+    ('[{"a": 1}', "unterminated array"),
+    ('[{"a": 1}, {"b": nope}, {"c": 3}]', "invalid JSON in node at byte 11"),
+])
+@pytest.mark.parametrize("chunk_size", [1, 4, 1 << 20])
+def test_truncated_and_malformed_input(tmp_path, text, message, chunk_size):
+    path = write(tmp_path, text)
+    with pytest.raises(ValueError, match=message):
+        parse(path, chunk_size)
+
+
+def test_syntax_error_does_not_read_the_rest_of_the_file(tmp_path, monkeypatch):
+    tail = ", ".join(json.dumps({"i": i}) for i in range(5000))
+    path = write(tmp_path, '[{"a": nope}, ' + tail + "]")
+    reads = []
+
+    class CountingMap(vc.mmap.mmap):
+        def __getitem__(self, key):
+            reads.append(key)
+            return super().__getitem__(key)
+
+    monkeypatch.setattr(vc.mmap, "mmap", CountingMap)
+    with pytest.raises(ValueError, match="invalid JSON in node at byte 1"):
+        parse(path, 64)
+    assert reads == [slice(0, 64)]
+
+
+def test_oversized_partial_node_is_rejected(tmp_path):
+    path = write(tmp_path, '[{"a": "' + "x" * 10000)
+    with pytest.raises(ValueError, match="larger than 1000 characters"):
+        parse(path, 64, max_node=1000)
+
+
+# -- --incremental ---------------------------------------------------------
+
+@pytest.fixture
+def codex(tmp_path, monkeypatch):
+    """Write a codex into tmp_path/data and run the validator there."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+
+    def save(nodes):
+        with open(vc.EXPANDED_PATH, "w", encoding="utf-8") as f:
+            json.dump(nodes, f, ensure_ascii=False, indent=2)
+    return save
+
+
+def run(capsys, *argv):
+    with pytest.raises(SystemExit) as exit_info:
+        vc.main(list(argv))
+    return exit_info.value.code, capsys.readouterr().out
+
+
+def test_incremental_reuses_unchanged_nodes(codex, capsys, monkeypatch):
+    nodes = [make_node(i) for i in range(20)]
+    codex(nodes)
+    code, out = run(capsys, "--incremental")
+    assert code == 0 and "20 nodes validated (20 re-hashed, 0 unchanged)" in out
+    manifest = json.load(open(vc.MANIFEST_PATH, encoding="utf-8"))
+    assert manifest["version"] == vc.MANIFEST_VERSION
+    assert manifest["digest"] == vc.file_digest(vc.EXPANDED_PATH)
+    assert len(manifest["nodes"]) == 20 and all(e["length"] > 0 for e in manifest["nodes"].values())
+
+    # Identical file: nothing is parsed.
+    real_iter_nodes = vc.iter_nodes
+    monkeypatch.setattr(vc, "iter_nodes", None)
+    assert run(capsys, "--incremental") == (0, "[OK] 20 nodes unchanged since the last successful run.\n")
+    monkeypatch.setattr(vc, "iter_nodes", real_iter_nodes)
+
+    # Edit, insert and delete: only the edited and inserted nodes are decoded.
+    nodes[5] = make_node(5, function="a much longer function description ✶✶")
+    nodes.insert(10, make_node(100))
+    del nodes[15]
+    codex(nodes)
+    decoded = []
+    real_node_lock_hash = vc.node_lock_hash
+
+    def counting(n):
+        decoded.append(n["node_id"])
+        return real_node_lock_hash(n)
+    monkeypatch.setattr(vc, "node_lock_hash", counting)
+    code, out = run(capsys, "--incremental")
+    assert code == 0
+    assert "20 nodes validated (2 re-hashed, 18 unchanged)" in out
+    assert sorted(decoded) == [5, 100]
+
+
+def test_incremental_still_catches_tampering_and_duplicates(codex, capsys):
+    nodes = [make_node(i) for i in range(10)]
+    codex(nodes)
+    assert run(capsys, "--incremental")[0] == 0
+    before = open(vc.MANIFEST_PATH, encoding="utf-8").read()
+
+    nodes[3]["name"] = "tampered"
+    codex(nodes)
+    code, out = run(capsys, "--incremental")
+    assert code == 1 and "node 3: lock_hash mismatch" in out
+    assert open(vc.MANIFEST_PATH, encoding="utf-8").read() == before  # only successful runs are recorded
+
+    nodes[3] = make_node(3)
+    codex(nodes + [nodes[7]])
+    code, out = run(capsys, "--incremental")
+    assert code == 1 and "duplicate node_id 7" in out
+
+
+def test_manifest_from_another_version_is_ignored(codex, capsys):
+    codex([make_node(i) for i in range(3)])
+    assert run(capsys, "--incremental")[0] == 0
+    manifest = json.load(open(vc.MANIFEST_PATH, encoding="utf-8"))
+    manifest["version"] = vc.MANIFEST_VERSION - 1
+    with open(vc.MANIFEST_PATH, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    assert "(3 re-hashed, 0 unchanged)" in run(capsys, "--incremental")[1]
@@ -0,0 +1,37 @@
+"""Tests for visionary_palette.py: which JSON leaves become palettes."""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import visionary_palette as vp  # noqa: E402
+
+
+def load(tmp_path, data, name="test.json"):
+    (tmp_path / name).write_text(data if isinstance(data, str) else json.dumps(data), encoding="utf-8")
+    return vp.load_palettes.__wrapped__(str(tmp_path))
+
+
+def test_text_fields_beside_colours_are_skipped(tmp_path):
+    palettes = load(tmp_path, {"sunset": {"label": "Sunset", "a": "#ff0000", "b": "0f0"},
+                               "group": {"note": "x", "night": ["#000000", [0, 0, 255]]}})
+    assert palettes == {"sunset": ((255, 0, 0), (0, 255, 0)), "group.night": ((0, 0, 0), (0, 0, 255))}
+
+
+def test_list_with_a_non_colour_is_not_a_palette(tmp_path):
+    assert load(tmp_path, {"words": ["#ffffff", "Sunset"]}) == {}
+
+
+@pytest.mark.parametrize("value", ["Su", "#ff00", "#gggggg", "ff0000ff"])
+def test_parse_color_rejects_non_hex(value):
+    with pytest.raises(ValueError, match="bad colour"):
+        vp.parse_color(value)
+
+
+def test_parse_errors_name_the_file(tmp_path):
+    with pytest.raises(ValueError, match="broken.json"):
+        load(tmp_path, "{not json", name="broken.json")
@@ -0,0 +1,136 @@
+"""Seeded fractal noise for the visionary renderers.
+
+- Every octave draws from its own ``np.random.Generator`` (Philox, spawned from
+  one ``SeedSequence``), so output depends only on the seed, never on global
+  state, and renders are safe to run in threads.
+- Philox is counter based: any band of lattice rows can be drawn directly, so
+  a horizontal strip of the image costs only the rows it touches.
+- Octaves are upsampled in float32 (separable bilinear or Perlin gradients)
+  and accumulated in place into one preallocated buffer.
+"""
+
+import numpy as np
+
+KINDS = ("value", "perlin")
+ALIASES = {"gradient": "perlin"}  # Perlin noise is gradient noise; both names select it
+BLOCK_PIXELS = 1 << 18  # rows of gradient noise are evaluated in blocks of about this many pixels
+
+def octave_seeds(seed, octaves: int) -> list:
+    """One independent SeedSequence per octave (like ``spawn``, but repeatable)."""
+    ss = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    return [np.random.SeedSequence(ss.entropy, spawn_key=ss.spawn_key + (o,)) for o in range(octaves)]
+
+def lattice_rows(seed: np.random.SeedSequence, cols: int, r0: int, r1: int) -> np.ndarray:
+    """Rows r0..r1 of an unbounded uniform [0, 1) lattice, identical however it is sliced."""
+    pitch = -(-cols // 4) * 4  # Philox emits 4 draws per counter step
+    rng = np.random.Generator(np.random.Philox(seed))
+    rng.bit_generator.advance(r0 * pitch // 4)
+    return rng.random((r1 - r0, pitch))[:, :cols].astype(np.float32)
+
+def _bilinear_axis(src: int, dst: int):
+    """Source indices and weights for resizing one axis (pixel centres aligned, edges clamped)."""
+    pos = (np.arange(dst, dtype=np.float64) + 0.5) * (src / dst) - 0.5
+    pos = np.clip(pos, 0, src - 1)
+    i0 = np.minimum(pos.astype(np.intp), src - 1)
+    return i0, (pos - i0).astype(np.float32)
+
+def _value_octave(out, scratch, seed, width, height, y0, lw, lh, amplitude) -> None:
+    """out += amplitude * bilinear upsample of an (lh, lw) random lattice, for rows y0.."""
+    rows = out.shape[0]
+    ix, fx = _bilinear_axis(lw, width)
+    iy, fy = _bilinear_axis(lh, height)
+    iy, fy = iy[y0:y0 + rows], fy[y0:y0 + rows]
+    r0, r1 = int(iy[0]), min(int(iy[-1]) + 2, lh)
+    layer = lattice_rows(seed, lw, r0, r1)
+    layer *= amplitude
+    if lw == width and lh == height:  # per-pixel octave: nothing to interpolate
+        out += layer[:rows]
+        return
+    # Interpolate along x on the small lattice first, then along y at full size.
+    if lw == width:
+        row = layer
+    else:
+        row = layer[:, ix]
+        row += (layer[:, np.minimum(ix + 1, lw - 1)] - row) * fx
+    step = np.zeros_like(row)
+    step[:-1] = row[1:] - row[:-1]
+    np.take(row, iy - r0, axis=0, out=scratch)
+    out += scratch
+    np.take(step, iy - r0, axis=0, out=scratch)
+    scratch *= fy[:, None]
+    out += scratch
+
+def _fade(t: np.ndarray) -> np.ndarray:
+    return t * t * t * (t * (t * 6 - 15) + 10)
+
+def _gradient_octave(out, seed, width, height, y0, cell, amplitude) -> None:
+    """out += amplitude * Perlin gradient noise with `cell` pixels per lattice cell, mapped to [0, 1]."""
+    rows = out.shape[0]
+    px = (np.arange(width, dtype=np.float32) + 0.5) / cell
+    py = (np.arange(y0, y0 + rows, dtype=np.float32) + 0.5) / cell
+    ix = px.astype(np.intp)
+    iy = py.astype(np.intp)
+    fx, fy = px - ix, py - iy
+    u, v = _fade(fx), _fade(fy)
+    r0 = int(iy[0])
+    angles = lattice_rows(seed, int(ix[-1]) + 2, r0, int(iy[-1]) + 2)
+    angles *= np.float32(2 * np.pi)
+    gx, gy = np.cos(angles), np.sin(angles)
+    # n/sqrt(2) keeps 2-D Perlin noise inside [-0.5, 0.5]
+    scale = np.float32(amplitude / np.sqrt(2))
+    block = max(1, BLOCK_PIXELS // width)
+    for b in range(0, rows, block):
+        ry = iy[b:b + block] - r0
+        yf = fy[b:b + block, None]
+        gx0, gx1, gy0, gy1 = gx[ry], gx[ry + 1], gy[ry], gy[ry + 1]
+        n00 = gx0[:, ix] * fx + gy0[:, ix] * yf
+        n10 = gx0[:, ix + 1] * (fx - 1) + gy0[:, ix + 1] * yf
+        n01 = gx1[:, ix] * fx + gy1[:, ix] * (yf - 1)
+        n11 = gx1[:, ix + 1] * (fx - 1) + gy1[:, ix + 1] * (yf - 1)
+        n10 -= n00
+        n10 *= u
+        n00 += n10
+        n11 -= n01
+        n11 *= u
+        n01 += n11
+        n01 -= n00
+        n01 *= v[b:b + block, None]
+        n00 += n01
+        n00 *= scale
+        n00 += np.float32(amplitude / 2)
+        out[b:b + block] += n00
+
+def fractal_noise(width: int, height: int, octaves: int = 6, persistence: float = 0.5, seed=None,
+                  kind: str = "value", y0: int = 0, rows: int | None = None, out: np.ndarray | None = None,
+                  cell: float | None = None) -> np.ndarray:
+    """Fractal Brownian motion in [0, 1] as float32.
+
+    ``value`` layers random lattices of width/2**o cells (octave 0 is per pixel,
+    as in the original renderer). ``perlin`` (also accepted as ``gradient``)
+    layers Perlin gradient noise whose cells start at ``cell`` pixels (default a quarter of the longer side)
+    and halve each octave. ``y0``/``rows`` select a horizontal strip; strips of
+    the same seed tile seamlessly. Pass ``out`` to reuse an accumulation buffer.
+    """
+    kind = ALIASES.get(kind, kind)
+    if kind not in KINDS:
+        raise ValueError(f"unknown noise kind {kind!r}; expected one of {KINDS}")
+    rows = height - y0 if rows is None else min(rows, height - y0)
+    if out is None:
+        out = np.zeros((rows, width), dtype=np.float32)
+    else:
+        out = out[:rows]
+        out.fill(0)
+    scratch = np.empty_like(out) if kind == "value" else None
+    cell = cell or max(width, height) / 4
+    amplitude, frequency, total_amp = 1.0, 1.0, 0.0
+    for o, octave_seed in enumerate(octave_seeds(seed, octaves)):
+        if kind == "value":
+            lw, lh = max(1, int(width / frequency)), max(1, int(height / frequency))
+            _value_octave(out, scratch, octave_seed, width, height, y0, lw, lh, amplitude)
+        else:
+            _gradient_octave(out, octave_seed, width, height, y0, max(cell / 2 ** o, 1.0), amplitude)
+        total_amp += amplitude
+        amplitude *= persistence
+        frequency *= 2.0
+    out /= np.float32(total_amp)
+    return out
@@ -0,0 +1,115 @@
+"""Palettes for the visionary renderers, compiled to lookup tables.
+
+- Palettes live in ``data/palettes/*.json``. A palette is either a list of
+  colour stops or an object of named stops; nested objects become dotted
+  names (``visionary.core``). Stops are ``"#RRGGBB"`` strings or ``[r, g, b]``.
+- ``palette_lut(name)`` linearly interpolates the stops into a uint8 table
+  once per (name, size) and caches it read-only; ``apply_lut`` maps a float
+  image onto it with one fancy-index gather instead of three ``np.interp``
+  passes.
+- ``palette_lut_list`` is the standard-library equivalent (a list of RGB
+  tuples) for renderers running without NumPy.
+"""
+
+import json
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # optional: only the stdlib LUT is available
+    np = None
+
+PALETTE_DIR = Path(__file__).resolve().parent / "data" / "palettes"
+LUT_SIZE = 4096
+HEX_COLOR = re.compile(r"#?(?:[0-9a-fA-F]{3}|[0-9a-fA-F]{6})")
+
+RGB = Tuple[int, int, int]
+
+def parse_color(value) -> RGB:
+    if isinstance(value, str):
+        if not HEX_COLOR.fullmatch(value):
+            raise ValueError(f"bad colour {value!r}")
+        h = value.lstrip("#")
+        if len(h) == 3:
+            h = "".join(c * 2 for c in h)
+        return tuple(int(h[i:i + 2], 16) for i in (0, 2, 4))
+    if isinstance(value, (list, tuple)) and len(value) == 3:
+        return tuple(int(c) for c in value)
+    raise ValueError(f"bad colour {value!r}")
+
+def _is_color(value) -> bool:
+    return (isinstance(value, str) and HEX_COLOR.fullmatch(value) is not None) or (
+        isinstance(value, list) and len(value) == 3 and all(isinstance(c, (int, float)) for c in value))
+
+def _collect(prefix: str, value, out: Dict[str, Tuple[RGB, ...]]) -> None:
+    """Colour lists and objects become palettes; other leaves (labels, notes) are skipped."""
+    if isinstance(value, list) and value and all(_is_color(v) for v in value):
+        out[prefix] = tuple(parse_color(v) for v in value)
+    elif isinstance(value, dict):
+        nested = any(isinstance(v, dict) for v in value.values())
+        stops = [v for v in value.values() if _is_color(v)]
+        if stops and not nested:
+            out[prefix] = tuple(parse_color(v) for v in stops)
+        for key, sub in value.items():
+            if isinstance(sub, (dict, list)) and not _is_color(sub):
+                _collect(f"{prefix}.{key}" if prefix else key, sub, out)
+
+@lru_cache(maxsize=4)
+def load_palettes(directory: str = str(PALETTE_DIR)) -> Dict[str, Tuple[RGB, ...]]:
+    """Palette name -> colour stops, from every JSON file in `directory` (sorted; later files win)."""
+    palettes: Dict[str, Tuple[RGB, ...]] = {}
+    for path in sorted(Path(directory).glob("*.json")):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                _collect("", json.load(f), palettes)
+        except ValueError as exc:
+            raise ValueError(f"{path}: {exc}") from exc
+    return palettes
+
+def _lerp_stops(stops, t: float) -> RGB:
+    p = t * (len(stops) - 1)
+    i = min(int(p), len(stops) - 2) if len(stops) > 1 else 0
+    f = p - i
+    a, b = stops[i], stops[min(i + 1, len(stops) - 1)]
+    return tuple(int(round(a[c] + (b[c] - a[c]) * f)) for c in range(3))
+
+@lru_cache(maxsize=64)
+def compile_lut(stops: Tuple[RGB, ...], size: int = LUT_SIZE):
+    """(size, 3) uint8 table spanning the stops evenly; read-only and shared."""
+    if np is None:
+        raise RuntimeError("compile_lut needs NumPy; use palette_lut_list instead")
+    stops_arr = np.asarray(stops, dtype=np.float64)
+    t = np.linspace(0.0, 1.0, size)
+    xp = np.linspace(0.0, 1.0, len(stops))
+    lut = np.empty((size, 3), dtype=np.uint8)
+    for c in range(3):
+        lut[:, c] = np.rint(np.interp(t, xp, stops_arr[:, c]))
+    lut.setflags(write=False)
+    return lut
+
+@lru_cache(maxsize=64)
+def compile_lut_list(stops: Tuple[RGB, ...], size: int = LUT_SIZE) -> List[RGB]:
+    """Pure-Python table of `size` RGB tuples."""
+    return [_lerp_stops(stops, i / (size - 1)) for i in range(size)]
+
+def palette_lut(name: str, size: int = LUT_SIZE):
+    return compile_lut(load_palettes()[name], size)
+
+def palette_lut_list(name: str, size: int = LUT_SIZE) -> List[RGB]:
+    return compile_lut_list(load_palettes()[name], size)
+
+def apply_lut(values, lut, lo: float, hi: float, out=None):
+    """Map `values` linearly from [lo, hi] onto `lut` -> uint8 RGB of shape values.shape + (3,)."""
+    size = len(lut)
+    scale = (size - 1) / (hi - lo) if hi > lo else 0.0
+    idx = np.asarray(values, dtype=np.float32) - np.float32(lo)
+    idx *= np.float32(scale)
+    idx += np.float32(0.5)
+    np.clip(idx, 0, size - 1, out=idx)
+    index = idx.astype(np.uint16 if size <= 1 << 16 else np.intp)
+    if out is None:
+        out = np.empty(index.shape + (3,), dtype=np.uint8)
+    return np.take(lut, index, axis=0, out=out)
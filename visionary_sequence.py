@@ -0,0 +1,169 @@
+"""Render looping visionary sequences for video walls.
+
+- ``radial``: the pattern's phase turns once over the sequence, so the last
+  frame leads back into the first. sin/cos of the invariant terms (built from
+  the meshgrid, R and T) are computed once; each frame is then two
+  multiply-adds: sin(A + p) + cos(B - p) = (sin A + cos B) cos p + (cos A + sin B) sin p.
+- ``fractal``/``perlin``: a window drifts down one seeded noise field, drawing
+  only the rows each frame needs (see visionary_noise). To loop, each frame
+  crossfades the window ``frames`` steps further down into its own, so the
+  drift's tail blends back into its head.
+- The palette LUT and normalization bounds are fixed for the whole sequence
+  (for noise, the extent of the whole field), so colours neither flicker nor
+  clip between frames.
+- Frames render in parallel on a thread pool and go to numbered PNGs or, with
+  ``--raw``, as rgb24 frames on stdout for an external encoder::
+
+    python visionary_sequence.py --raw | ffmpeg -f rawvideo -pix_fmt rgb24 \\
+        -s 1920x1080 -r 30 -i - loop.mp4
+"""
+
+import argparse
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from png_stream import PNGWriter
+from visionary_palette import apply_lut, palette_lut
+from visionary_world_builder import PALETTES, PATTERN_BOUNDS, PATTERNS, _extent, _is_noise, _ordered_map
+
+class RadialFrames:
+    """Radial pattern with its phase advanced by 2*pi*i/frames."""
+
+    def __init__(self, width: int, height: int, frames: int):
+        self.width, self.height, self.frames = width, height, frames
+        x = np.linspace(-1, 1, width, dtype=np.float32)
+        y = np.linspace(-1, 1, height, dtype=np.float32)
+        X, Y = np.meshgrid(x, y)
+        R = np.sqrt(X**2 + Y**2)
+        T = np.arctan2(Y, X)
+        A = 8 * R**2 + 6 * T
+        B = 4 * R - 3 * T
+        self.p = np.sin(A) + np.cos(B)
+        self.q = np.cos(A) + np.sin(B)
+        self.bounds = PATTERN_BOUNDS["radial"]
+        self._local = threading.local()
+
+    def frame(self, i: int) -> np.ndarray:
+        """Pattern values of frame i in a per-thread scratch buffer (valid until the next call)."""
+        local = self._local
+        if not hasattr(local, "buf"):
+            local.buf = np.empty_like(self.p)
+            local.tmp = np.empty_like(self.p)
+        phase = 2 * np.pi * i / self.frames
+        np.multiply(self.p, np.float32(np.cos(phase)), out=local.buf)
+        np.multiply(self.q, np.float32(np.sin(phase)), out=local.tmp)
+        local.buf += local.tmp
+        return local.buf
+
+class NoiseFrames:
+    """A height-row window sliding `step` rows per frame down one seeded noise field.
+
+    Frame i is (1 - i/frames) * window(i + frames) + (i/frames) * window(i), so
+    frame `frames` would equal frame 0 and the sequence loops without a jump.
+    """
+
+    def __init__(self, width: int, height: int, frames: int, pattern_fn, seed: int | None, step: int = 4):
+        self.width, self.height, self.frames, self.step = width, height, frames, step
+        self.pattern_fn = pattern_fn
+        self.total = height + step * (2 * frames - 1)
+        self.seq = np.random.SeedSequence(seed)
+        self.cell = max(width, height) / 4  # keep the look of a still frame at this size
+        self._local = threading.local()
+        # Frames are convex blends of the field, so its extent bounds every frame.
+        self.bounds = self._field_extent()
+
+    def _rows(self, y0: int, rows: int, out: np.ndarray) -> np.ndarray:
+        return self.pattern_fn(self.width, self.total, seed=self.seq, y0=y0, rows=rows, out=out, cell=self.cell)
+
+    def _field_extent(self, strip_rows: int = 256) -> tuple[float, float]:
+        buf = np.empty((strip_rows, self.width), dtype=np.float32)
+        extents = [_extent(self._rows(y0, strip_rows, buf)) for y0 in range(0, self.total, strip_rows)]
+        return min(e[0] for e in extents), max(e[1] for e in extents)
+
+    def frame(self, i: int) -> np.ndarray:
+        """Pattern values of frame i in a per-thread scratch buffer (valid until the next call)."""
+        local = self._local
+        if not hasattr(local, "buf"):
+            local.buf = np.empty((self.height, self.width), dtype=np.float32)
+            local.tail = np.empty_like(local.buf)
+        head = self._rows(i * self.step, self.height, local.buf)
+        tail = self._rows((i + self.frames) * self.step, self.height, local.tail)
+        mix = np.float32(i / self.frames)
+        head *= mix
+        tail *= 1 - mix
+        head += tail
+        return head
+
+def frame_source(pattern: str, width: int, height: int, frames: int, seed: int | None = None, step: int = 4):
+    pattern_fn = PATTERNS[pattern]
+    if _is_noise(pattern_fn):
+        return NoiseFrames(width, height, frames, pattern_fn, seed, step)
+    if pattern == "radial":
+        return RadialFrames(width, height, frames)
+    raise ValueError(f"pattern {pattern!r} has no animated form")
+
+def render_frames(source, lut: np.ndarray, workers: int | None = None, write=None):
+    """Yield (index, uint8 RGB frame) in order, rendered across a thread pool.
+
+    With `write(index, rgb)`, frames are also written from the worker threads
+    (e.g. compressed to PNG) before they are yielded.
+    """
+    lo, hi = source.bounds
+    workers = workers or os.cpu_count() or 1
+
+    def render(i):
+        rgb = apply_lut(source.frame(i), lut, lo, hi)
+        if write is not None:
+            write(i, rgb)
+        return i, rgb
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        yield from _ordered_map(pool, render, range(source.frames), 2 * workers)
+
+def png_writer(out_dir: str, prefix: str = "frame_", level: int = 6):
+    """write(index, rgb) callback saving out_dir/prefix00000.png."""
+    os.makedirs(out_dir, exist_ok=True)
+
+    def write(i, rgb):
+        path = Path(out_dir) / f"{prefix}{i:05d}.png"
+        with PNGWriter(str(path), rgb.shape[1], rgb.shape[0], level=level) as png:
+            png.write_rows(rgb)
+    return write
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Render a looping visionary sequence")
+    parser.add_argument("--width", type=int, default=1920, help="frame width in pixels")
+    parser.add_argument("--height", type=int, default=1080, help="frame height in pixels")
+    parser.add_argument("--frames", type=int, default=120, help="number of frames in the loop")
+    parser.add_argument("--pattern", choices=PATTERNS.keys(), default="radial", help="pattern algorithm")
+    parser.add_argument("--palette", choices=PALETTES.keys(), default="alex_grey", help="color palette")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for noise patterns")
+    parser.add_argument("--step", type=int, default=4,
+                        help="rows the noise window drifts per frame (noise patterns loop by crossfading)")
+    parser.add_argument("--workers", type=int, default=None, help="threads rendering frames")
+    parser.add_argument("--out-dir", default="frames", help="directory for numbered PNG frames")
+    parser.add_argument("--prefix", default="frame_", help="PNG file name prefix")
+    parser.add_argument("--raw", action="store_true", help="write rgb24 frames to stdout instead of PNGs")
+    args = parser.parse_args()
+
+    if args.frames < 1:
+        parser.error("--frames must be at least 1")
+    source = frame_source(args.pattern, args.width, args.height, args.frames, args.seed, args.step)
+    lut = palette_lut(args.palette)
+    if args.raw:
+        out = sys.stdout.buffer
+        for _, rgb in render_frames(source, lut, args.workers):
+            out.write(rgb.data)
+        out.flush()
+        return
+    for i, _ in render_frames(source, lut, args.workers, write=png_writer(args.out_dir, args.prefix)):
+        print(f"\rframe {i + 1}/{args.frames}", end="", file=sys.stderr)
+    print(file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -2,71 +2,126 @@
 
 # Import required libraries
 import argparse
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import numpy as np
 from PIL import Image
 
-def fractal_noise(width: int, height: int, octaves: int = 6, persistence: float = 0.5) -> np.ndarray:
-    """Create fractal Brownian motion using layered random noise."""
-    noise = np.zeros((height, width))
-    amplitude, frequency, total_amp = 1.0, 1.0, 0.0
-    for _ in range(octaves):
-        layer = np.random.rand(max(1, int(height / frequency)), max(1, int(width / frequency)))
-        layer_img = Image.fromarray((layer * 255).astype(np.uint8)).resize((width, height), resample=Image.BILINEAR)
-        noise += (np.array(layer_img) / 255.0) * amplitude
-        total_amp += amplitude
-        amplitude *= persistence
-        frequency *= 2.0
-    return noise / total_amp
-
-def radial_pattern(width: int, height: int) -> np.ndarray:
-    """Generate a radial trigonometric pattern for mandala-like symmetry."""
-    x = np.linspace(-1, 1, width)
-    y = np.linspace(-1, 1, height)
+from png_stream import PNGWriter
+from visionary_noise import fractal_noise
+from visionary_palette import apply_lut, load_palettes, palette_lut
+
+def radial_pattern(width: int, height: int, y0: int = 0, rows: int | None = None, dtype=np.float64) -> np.ndarray:
+    """Generate a radial trigonometric pattern for mandala-like symmetry.
+
+    `y0`/`rows` select a horizontal strip of the full image, so large renders
+    can be produced tile by tile.
+    """
+    x = np.linspace(-1, 1, width).astype(dtype, copy=False)
+    y = np.linspace(-1, 1, height)[y0:None if rows is None else y0 + rows].astype(dtype, copy=False)
     X, Y = np.meshgrid(x, y)
     R = np.sqrt(X**2 + Y**2)
     T = np.arctan2(Y, X)
     return np.sin(8 * R**2 + 6 * T) + np.cos(4 * R - 3 * T)
 
-PALETTES = {
-    "alex_grey": np.array([
-        [20, 30, 80],
-        [70, 20, 150],
-        [180, 40, 240],
-        [255, 140, 0],
-        [255, 220, 100],
-    ]) / 255.0,
-    "hilma_af_klint": np.array([
-        [255, 200, 221],
-        [211, 226, 255],
-        [255, 255, 204],
-        [204, 246, 221],
-        [229, 203, 255],
-    ]) / 255.0,
-    "surrealism": np.array([
-        [10, 25, 66],
-        [58, 12, 163],
-        [101, 84, 192],
-        [255, 99, 72],
-        [255, 219, 88],
-    ]) / 255.0,
-}
+# Palette name -> colour stops, from data/palettes/*.json
+PALETTES = load_palettes()
 
 PATTERNS = {
     "fractal": fractal_noise,
+    "perlin": partial(fractal_noise, kind="perlin"),
     "radial": radial_pattern,
 }
 
-def build_image(width: int, height: int, pattern_fn, palette: np.ndarray, seed: int | None) -> Image.Image:
-    """Construct the visionary artwork using the selected pattern and palette."""
-    if seed is not None:
-        np.random.seed(seed)
-    pattern = pattern_fn(width, height)
-    pattern_norm = (pattern - pattern.min()) / (pattern.max() - pattern.min())
-    xp = np.linspace(0, 1, len(palette))
-    rgb = np.empty((height, width, 3))
-    for c in range(3):
-        rgb[..., c] = np.interp(pattern_norm, xp, palette[:, c])
-    return Image.fromarray((rgb * 255).astype(np.uint8))
+def _is_noise(pattern_fn) -> bool:
+    """Noise patterns take a seed and can render strips themselves."""
+    return getattr(pattern_fn, "func", pattern_fn) is fractal_noise
+
+def build_image(width: int, height: int, pattern_fn, lut: np.ndarray, seed: int | None) -> Image.Image:
+    """Construct the visionary artwork using the selected pattern and palette LUT."""
+    pattern = pattern_fn(width, height, seed=seed) if _is_noise(pattern_fn) else pattern_fn(width, height)
+    return Image.fromarray(apply_lut(pattern, lut, float(pattern.min()), float(pattern.max())))
+
+# Known value range of a pattern, usable instead of a min/max pre-pass.
+PATTERN_BOUNDS = {
+    "fractal": (0.0, 1.0),
+    "perlin": (0.0, 1.0),
+    "radial": (-2.0, 2.0),
+}
+
+def _strip_source(pattern_fn, width: int, height: int, seed: int | None):
+    """Return strip(y0, rows) -> float32 pattern rows for the chosen algorithm."""
+    if pattern_fn is radial_pattern:
+        return lambda y0, rows: radial_pattern(width, height, y0, rows, dtype=np.float32)
+    if _is_noise(pattern_fn):
+        # One SeedSequence for all strips, so they tile even when seed is None.
+        seq = np.random.SeedSequence(seed)
+        return lambda y0, rows: pattern_fn(width, height, seed=seq, y0=y0, rows=rows)
+    # Patterns without strip support are computed once and sliced.
+    full = pattern_fn(width, height).astype(np.float32, copy=False)
+    return lambda y0, rows: full[y0:y0 + rows]
+
+def _extent(strip: np.ndarray) -> tuple[float, float]:
+    return float(strip.min()), float(strip.max())
+
+def _ordered_map(pool, fn, items, window: int):
+    """Like pool.map, but with at most `window` results pending at once."""
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def render_strips(
+    width: int,
+    height: int,
+    pattern_fn,
+    lut: np.ndarray,
+    seed: int | None,
+    tile_rows: int = 256,
+    workers: int | None = None,
+    bounds: tuple[float, float] | None = None,
+):
+    """Yield (y0, uint8 RGB strip) top to bottom, rendered across a thread pool.
+
+    Work is float32 and per strip, and only a few strips are in flight, so
+    memory is bounded by tile size. Normalization uses `bounds` when given,
+    otherwise a cheap first pass that only keeps each strip's min and max.
+    """
+    strip = _strip_source(pattern_fn, width, height, seed)
+    starts = range(0, height, tile_rows)
+    workers = workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        if bounds is None:
+            extents = list(_ordered_map(pool, lambda y0: _extent(strip(y0, tile_rows)), starts, 2 * workers))
+            bounds = (min(e[0] for e in extents), max(e[1] for e in extents))
+        lo, hi = bounds
+
+        def render(y0):
+            return y0, apply_lut(strip(y0, tile_rows), lut, lo, hi)
+
+        yield from _ordered_map(pool, render, starts, 2 * workers)
+
+def build_image_tiled(width: int, height: int, pattern_fn, lut: np.ndarray, seed: int | None,
+                      tile_rows: int = 256, workers: int | None = None,
+                      bounds: tuple[float, float] | None = None) -> Image.Image:
+    """Render strip by strip into one in-memory image (see render_strips)."""
+    out = np.empty((height, width, 3), dtype=np.uint8)
+    for y0, rgb in render_strips(width, height, pattern_fn, lut, seed, tile_rows, workers, bounds):
+        out[y0:y0 + len(rgb)] = rgb
+    return Image.fromarray(out)
+
+def save_png_streamed(filename: str, width: int, height: int, pattern_fn, lut: np.ndarray,
+                      seed: int | None, tile_rows: int = 256, workers: int | None = None,
+                      bounds: tuple[float, float] | None = None) -> None:
+    """Compress strips into `filename` as they are produced; the full image is never held."""
+    with PNGWriter(filename, width, height) as png:
+        for _, rgb in render_strips(width, height, pattern_fn, lut, seed, tile_rows, workers, bounds):
+            png.write_rows(rgb)
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Visionary world-building art generator")
@@ -77,72 +132,37 @@ def main() -> None:
     parser.add_argument("--seed", type=int, default=None, help="random seed for reproducibility")
     parser.add_argument("--output", default="Visionary_Dream.png", help="output filename")
     parser.add_argument("--show", action="store_true", help="display the image after generation")
+    parser.add_argument("--tile-rows", type=int, default=0,
+                        help="render in strips of this many rows across a thread pool (0 = single pass)")
+    parser.add_argument("--workers", type=int, default=None, help="threads for tiled rendering")
+    parser.add_argument("--analytic-bounds", action="store_true",
+                        help="normalize with the pattern's known range instead of a min/max pre-pass")
+    parser.add_argument("--stream", action="store_true",
+                        help="with --tile-rows, write the PNG strip by strip without holding the whole image")
     args = parser.parse_args()
-
-    img = build_image(args.width, args.height, PATTERNS[args.pattern], PALETTES[args.palette], args.seed)
+    bounds = None
+    if args.analytic_bounds:
+        if args.pattern not in PATTERN_BOUNDS:
+            parser.error(f"--analytic-bounds: no known range for pattern {args.pattern!r}")
+        bounds = PATTERN_BOUNDS[args.pattern]
+
+    if args.stream:
+        if args.tile_rows <= 0:
+            parser.error("--stream needs --tile-rows")
+        save_png_streamed(args.output, args.width, args.height, PATTERNS[args.pattern], palette_lut(args.palette),
+                          args.seed, args.tile_rows, args.workers, bounds)
+        if args.show:
+            Image.open(args.output).show()
+        return
+
+    if args.tile_rows > 0:
+        img = build_image_tiled(args.width, args.height, PATTERNS[args.pattern], palette_lut(args.palette),
+                                args.seed, args.tile_rows, args.workers, bounds)
+    else:
+        img = build_image(args.width, args.height, PATTERNS[args.pattern], palette_lut(args.palette), args.seed)
     img.save(args.output)
     if args.show:
         img.show()
 
 if __name__ == "__main__":
     main()
-=======
-"""Generate a dynamic world-building art piece inspired by Alex Grey."""
-
-# Import required libraries
-import numpy as np
-from PIL import Image
-from datetime import datetime
-
-# Resolution of the output image (4K)
-WIDTH, HEIGHT = 3840, 2160
-
-# Function to create fractal noise for terrain-like patterns
-def fractal_noise(width, height, octaves=6, persistence=0.5):
-    """Produce fractal Brownian motion using layered random noise."""
-    noise = np.zeros((height, width))
-    amplitude = 1.0
-    frequency = 1.0
-    total_amplitude = 0.0
-    for _ in range(octaves):
-        # Random layer at reduced resolution
-        layer = np.random.rand(max(1, int(height / frequency)), max(1, int(width / frequency)))
-        # Upscale layer to target resolution with smooth interpolation
-        layer_img = Image.fromarray((layer * 255).astype(np.uint8)).resize((width, height), resample=Image.BILINEAR)
-        layer_resized = np.array(layer_img) / 255.0
-        # Accumulate weighted layer
-        noise += layer_resized * amplitude
-        total_amplitude += amplitude
-        amplitude *= persistence
-        frequency *= 2.0
-    # Normalize composite noise
-    return noise / total_amplitude
-
-# Generate terrain-like noise pattern
-pattern = fractal_noise(WIDTH, HEIGHT)
-
-# Normalize pattern to [0, 1]
-pattern_norm = (pattern - pattern.min()) / (pattern.max() - pattern.min())
-
-# Psychedelic palette inspired by Alex Grey (RGB 0-1)
-palette = np.array([
-    [20, 30, 80],    # deep indigo
-    [70, 20, 150],   # violet
-    [180, 40, 240],  # magenta
-    [255, 140, 0],   # electric orange
-    [255, 220, 100], # radiant gold
-]) / 255.0
-
-# Interpolate palette across noise pattern
-xp = np.linspace(0, 1, len(palette))
-RGB = np.empty((HEIGHT, WIDTH, 3))
-for c in range(3):
-    RGB[..., c] = np.interp(pattern_norm, xp, palette[:, c])
-
-# Convert to 8-bit color and create image
-img = Image.fromarray((RGB * 255).astype(np.uint8))
-
-# Save the generated artwork with a timestamped filename
-timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-filename = f"Visionary_Dream_{timestamp}.png"
-img.save(filename)